@@ -0,0 +1,295 @@
+"""
+Shared full-article fetcher: one pooled keep-alive requests.Session, a
+per-host concurrency cap, an on-disk HTTP cache revalidated with
+ETag/Last-Modified, and per-site CSS-like selectors applied with a targeted
+HTMLParser that stops as soon as the selected element closes. A selector
+returns the same text as BeautifulSoup's find().get_text(); hosts without one
+use the generic article extractor. The charset comes from the Content-Type
+header, then a <meta> tag, never requests' ISO-8859-1 default.
+"""
+import os
+import re
+import json
+import codecs
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from html.parser import HTMLParser
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from html_extractor import (BLOCK_TAGS, FEED_CHUNK_SIZE, HIDDEN_TEXT_TAGS, VOID_TAGS, OpenElements,
+                            check_input_size, extract_article)
+
+logger = logging.getLogger(__name__)
+
+FETCH_MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", "16"))
+FETCH_PER_HOST = int(os.getenv("FETCH_PER_HOST", "2"))  # Concurrent requests per host
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "10"))
+FETCH_USER_AGENT = os.getenv("FETCH_USER_AGENT", "CurrentNewsBot/1.0 (+https://currently.hu)")
+FETCH_CACHE_DIR = os.getenv("FETCH_CACHE_DIR", "/tmp/http_cache")  # /tmp counts against function memory
+FETCH_CACHE_MAX_ENTRIES = int(os.getenv("FETCH_CACHE_MAX_ENTRIES", "500"))
+
+# Host -> selector for the article body; other hosts use the generic article scorer.
+# Extend with FETCH_SITE_SELECTORS='{"example.hu": "div.article-body"}'.
+SITE_SELECTORS = {
+    "konteo.blogrepublik.eu": "div.posztkenyerszoveg",
+    **json.loads(os.getenv("FETCH_SITE_SELECTORS", "{}")),
+}
+
+# Inside the selected element only strings BeautifulSoup's get_text() leaves out are dropped
+NON_TEXT_TAGS = frozenset(["script", "style"]) | HIDDEN_TEXT_TAGS
+# Elements that end a paragraph of the selected text; <br> only ends a line
+PARAGRAPH_BREAK_TAGS = BLOCK_TAGS | frozenset(["header", "footer", "nav", "aside", "hr", "form"])
+SELECTOR = re.compile(r"^([a-z0-9]*)((?:[.#][\w-]+)*)$", re.I)
+HEADER_CHARSET = re.compile(r"charset=[\"']?([\w.:-]+)", re.I)
+# <meta charset="..."> or <meta http-equiv="Content-Type" content="...; charset=...">
+META_CHARSET = re.compile(rb"<meta[^>]+charset=[\"']?([\w.:-]+)", re.I)
+META_SNIFF_BYTES = 4096
+
+_session_lock = threading.Lock()
+_host_limits: Dict[str, threading.BoundedSemaphore] = {}
+
+@lru_cache(maxsize=None)
+def _new_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=FETCH_MAX_WORKERS, max_retries=2)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["User-Agent"] = FETCH_USER_AGENT
+    return session
+
+def get_session() -> requests.Session:
+    """Return the shared Session, whose connection pool is sized for FETCH_MAX_WORKERS."""
+    with _session_lock:  # lru_cache alone may build two on a concurrent first call
+        return _new_session()
+
+def _host_limit(host: str) -> threading.BoundedSemaphore:
+    with _session_lock:
+        if host not in _host_limits:
+            _host_limits[host] = threading.BoundedSemaphore(FETCH_PER_HOST)
+        return _host_limits[host]
+
+# --- On-disk HTTP cache ---
+
+def _cache_paths(url: str):
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    return os.path.join(FETCH_CACHE_DIR, f"{key}.json"), os.path.join(FETCH_CACHE_DIR, f"{key}.body")
+
+def _load_cached(url: str):
+    meta_path, body_path = _cache_paths(url)
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(body_path, "rb") as f:
+            return meta, f.read()
+    except (OSError, ValueError):
+        return None, None
+
+def _store_cached(url: str, meta: dict, body: bytes):
+    os.makedirs(FETCH_CACHE_DIR, exist_ok=True)
+    meta_path, body_path = _cache_paths(url)
+    # Write-then-rename so concurrent readers never see a partial entry
+    for path, data in ((body_path, body), (meta_path, json.dumps(meta).encode("utf-8"))):
+        temp = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp, "wb") as f:
+            f.write(data)
+        os.replace(temp, path)
+
+def prune_cache(max_entries: int = FETCH_CACHE_MAX_ENTRIES):
+    """Drop the least recently written entries beyond max_entries."""
+    try:
+        metas = [e for e in os.scandir(FETCH_CACHE_DIR) if e.name.endswith(".json")]
+    except OSError:
+        return
+    metas.sort(key=lambda e: e.stat().st_mtime)
+    for entry in metas[:max(0, len(metas) - max_entries)]:
+        for path in (entry.path, entry.path[:-len(".json")] + ".body"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def _charset(response) -> str:
+    """
+    Charset from the Content-Type header if it names one, else the page's
+    <meta charset>, else requests' guess. requests' ISO-8859-1 default for a
+    bare text/html header is ignored; most pages without one are UTF-8.
+    """
+    match = HEADER_CHARSET.search(response.headers.get("Content-Type", ""))
+    if not match:
+        match = META_CHARSET.search(response.content[:META_SNIFF_BYTES])
+    if match:
+        name = match.group(1)
+        name = name.decode("ascii") if isinstance(name, bytes) else name
+        try:
+            return codecs.lookup(name).name
+        except LookupError:
+            logger.warning(f"Unknown charset {name}; guessing.")
+    return response.apparent_encoding or "utf-8"
+
+def fetch(url: str) -> Optional[str]:
+    """
+    GET url through the shared session and cache, decoded to text. Cached
+    entries are revalidated with If-None-Match/If-Modified-Since, and a 304
+    reuses the stored body. Returns None on errors.
+    """
+    meta, body = _load_cached(url)
+    headers = {}
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        with _host_limit(urlsplit(url).netloc.lower()):
+            response = get_session().get(url, headers=headers, timeout=FETCH_TIMEOUT)
+        if response.status_code == 304 and meta:
+            logger.info(f"Not modified, using cached copy: {url}")
+            return body.decode(meta.get("encoding") or "utf-8", errors="replace")
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logger.error(f"Error fetching URL {url}: {e}")
+        return None
+
+    encoding = _charset(response)
+    etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+    if etag or last_modified:
+        try:
+            _store_cached(url, {"url": url, "etag": etag, "last_modified": last_modified,
+                                "encoding": encoding, "fetched": time.time()}, response.content)
+        except OSError as e:
+            logger.warning(f"Could not cache {url}: {e}")
+    return response.content.decode(encoding, errors="replace")
+
+# --- Targeted extraction ---
+
+class SelectorExtractor(HTMLParser):
+    """
+    Collects the text of the first element matching a simple selector (tag,
+    .class, #id or combinations like div.a.b) and stops parsing once that
+    element closes. The strings are the ones bs4's find().get_text() returns;
+    inline runs are joined with whitespace collapsed, <br> starts a new line
+    and block elements start a new paragraph (separated by a blank line).
+    """
+
+    def __init__(self, selector: str):
+        super().__init__(convert_charrefs=True)
+        match = SELECTOR.match(selector.strip())
+        if not match:
+            raise ValueError(f"Unsupported selector: {selector}")
+        self.tag = match.group(1).lower() or None
+        parts = re.findall(r"([.#])([\w-]+)", match.group(2))
+        self.classes = {name for kind, name in parts if kind == "."}
+        self.element_id = next((name for kind, name in parts if kind == "#"), None)
+        self.open = OpenElements(NON_TEXT_TAGS)  # The matched element and everything open inside it
+        self.paragraphs = []
+        self.lines = []  # Finished lines of the current paragraph
+        self.pending = []  # Text of the current line
+        self.done = False
+
+    def matches(self, tag, attrs) -> bool:
+        attrs = dict(attrs)
+        return ((self.tag is None or tag == self.tag)
+                and self.classes <= set((attrs.get("class") or "").split())
+                and (self.element_id is None or attrs.get("id") == self.element_id))
+
+    def end_line(self):
+        text = " ".join("".join(self.pending).split())
+        self.pending = []
+        if text:
+            self.lines.append(text)
+
+    def end_paragraph(self):
+        self.end_line()
+        if self.lines:
+            self.paragraphs.append("\n".join(self.lines))
+            self.lines = []
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if not self.open.tags:
+            if tag not in VOID_TAGS and self.matches(tag, attrs):
+                self.open.push(tag)
+            return
+        if tag == "br":
+            self.end_line()
+        elif tag in PARAGRAPH_BREAK_TAGS:
+            self.end_paragraph()
+        if tag not in VOID_TAGS:
+            self.open.push(tag)
+
+    def handle_endtag(self, tag):
+        if self.done:
+            return
+        closed = self.open.pop_to(tag)
+        if any(t in PARAGRAPH_BREAK_TAGS for t in closed):
+            self.end_paragraph()
+        if closed and not self.open.tags:
+            self.done = True
+
+    def handle_data(self, data):
+        if self.open.tags and not self.done and not self.open.depth:
+            self.pending.append(data)
+
+    def close(self):
+        super().close()
+        self.end_paragraph()
+
+    def text(self) -> Optional[str]:
+        return "\n\n".join(self.paragraphs) if self.paragraphs else None
+
+def extract_with_selector(html: str, selector: str) -> Optional[str]:
+    """Text of the first element matching selector, or None if there is none."""
+    check_input_size(html)
+    parser = SelectorExtractor(selector)
+    for start in range(0, len(html), FEED_CHUNK_SIZE):
+        parser.feed(html[start:start + FEED_CHUNK_SIZE])
+        if parser.done:
+            break
+    parser.close()
+    return parser.text()
+
+def selector_for(url: str) -> Optional[str]:
+    host = urlsplit(url).netloc.lower()
+    for site, selector in SITE_SELECTORS.items():
+        if host == site or host.endswith(f".{site}"):
+            return selector
+    return None
+
+def extract_full_text(url: str, html: str) -> Optional[str]:
+    """Article body via the site's selector if one is configured, else the generic scorer."""
+    try:
+        selector = selector_for(url)
+        if selector:
+            text = extract_with_selector(html, selector)
+            if not text:
+                logger.warning(f"Selector '{selector}' not found on: {url}")
+            return text
+        return extract_article(html).text or None
+    except ValueError as e:
+        logger.warning(f"Could not extract {url}: {e}")
+        return None
+
+def fetch_article_text(url: str) -> Optional[str]:
+    html = fetch(url)
+    return extract_full_text(url, html) if html else None
+
+def fetch_many(urls: Iterable[str]) -> Dict[str, Optional[str]]:
+    """Fetch and extract full text for many URLs concurrently (politely per host)."""
+    urls = list(dict.fromkeys(u for u in urls if u))
+    if not urls:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(FETCH_MAX_WORKERS, len(urls))) as pool:
+        texts = dict(zip(urls, pool.map(fetch_article_text, urls)))
+    prune_cache()
+    logger.info(f"Fetched full text for {len([t for t in texts.values() if t])}/{len(urls)} articles.")
+    return texts
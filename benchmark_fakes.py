@@ -0,0 +1,602 @@
+"""
+In-process stand-ins for the external services the pipeline talks to:
+GCS, Supabase, Pub/Sub, Perplexity, Gemini (LLM + TTS), ElevenLabs, RSS feeds
+and article web pages.
+install_fakes() registers them in sys.modules so the Cloud Function modules
+can be imported and driven locally by benchmark_pipeline.py.
+"""
+import sys
+import json
+import base64
+import time
+import uuid
+import random
+import re
+import threading
+from html import escape
+from types import ModuleType, SimpleNamespace
+from collections import defaultdict, namedtuple
+from datetime import datetime, timezone
+
+# --- Synthetic MP3 ---
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, mono, no CRC. Zeroed side info decodes as silence.
+MP3_FRAME_HEADER = b"\xff\xfb\x90\xc0"
+MP3_FRAME_SIZE = 417
+MP3_FRAME_SECONDS = 1152 / 44100
+SILENT_FRAME = MP3_FRAME_HEADER + b"\x00" * (MP3_FRAME_SIZE - len(MP3_FRAME_HEADER))
+
+def silent_mp3(seconds: float) -> bytes:
+    """Structurally valid MP3 of roughly the given duration."""
+    return SILENT_FRAME * max(1, int(seconds / MP3_FRAME_SECONDS))
+
+def mp3_duration(data: bytes) -> float:
+    return (len(data) // MP3_FRAME_SIZE) * MP3_FRAME_SECONDS
+
+class FakeServiceError(Exception):
+    """Raised by the LLM/TTS stubs; the message mimics a quota error."""
+
+class PreconditionFailed(Exception):
+    """Named like google.api_core.exceptions.PreconditionFailed (HTTP 412)."""
+
+class FakeConfig:
+    """Latency (seconds) and failure rates for the LLM/TTS stubs."""
+
+    def __init__(self, llm_latency=0.05, tts_latency=0.2, llm_failure_rate=0.0,
+                 tts_failure_rate=0.0, chars_per_second=15.0, http_latency=0.02, seed=0):
+        self.llm_latency = llm_latency
+        self.http_latency = http_latency
+        self.tts_latency = tts_latency
+        self.llm_failure_rate = llm_failure_rate
+        self.tts_failure_rate = tts_failure_rate
+        self.chars_per_second = chars_per_second
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = defaultdict(int)
+        self.chars = defaultdict(int)
+
+    def call(self, backend: str, latency: float, failure_rate: float, chars: int = 0):
+        with self.lock:
+            self.calls[backend] += 1
+            self.chars[backend] += chars
+            # Jitter with a long tail so p95 differs from the mean
+            delay = latency * self.random.lognormvariate(0, 0.5)
+            fail = self.random.random() < failure_rate
+        time.sleep(delay)
+        if fail:
+            raise FakeServiceError(f"429 RESOURCE_EXHAUSTED: {backend} quota exceeded (fake)")
+
+# --- Google Cloud Storage ---
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.metadata = None
+        self.content_type = None
+        self.content_encoding = None
+        self.cache_control = None
+        self.generation = None
+
+    @property
+    def _data(self):
+        return self.bucket.objects.get(self.name)
+
+    @property
+    def size(self):
+        return len(self._data) if self._data is not None else None
+
+    def exists(self, **_kwargs):
+        return self.name in self.bucket.objects
+
+    def reload(self, **_kwargs):
+        stored = self.bucket.properties.get(self.name, {})
+        for key, value in stored.items():
+            setattr(self, key, value)
+
+    def _store(self, data, content_type=None, if_generation_match=None):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        with self.bucket.lock:
+            current = self.bucket.properties.get(self.name, {}).get("generation", 0)
+            if if_generation_match is not None and if_generation_match != current:
+                raise PreconditionFailed(f"412 PreconditionFailed: generation {current} != {if_generation_match}")
+            self.generation = current + 1
+            self.bucket.objects[self.name] = data
+            self.content_type = content_type or self.content_type
+            self.bucket.properties[self.name] = {
+                "metadata": self.metadata, "content_type": self.content_type,
+                "content_encoding": self.content_encoding, "cache_control": self.cache_control,
+                "generation": self.generation,
+            }
+            FakeStorageClient.bytes_uploaded += len(data)
+
+    def upload_from_string(self, data, content_type=None, if_generation_match=None, **_kwargs):
+        self._store(data, content_type, if_generation_match)
+
+    def upload_from_filename(self, filename, content_type=None, if_generation_match=None, **_kwargs):
+        with open(filename, "rb") as f:
+            self._store(f.read(), content_type, if_generation_match)
+
+    def upload_from_file(self, file_obj, content_type=None, if_generation_match=None, **_kwargs):
+        self._store(file_obj.read(), content_type, if_generation_match)
+
+    def _require(self):
+        if self._data is None:
+            raise FileNotFoundError(f"404 No such object: {self.bucket.name}/{self.name}")
+        return self._data
+
+    def download_as_bytes(self, **_kwargs):
+        return self._require()
+
+    download_as_string = download_as_bytes
+
+    def download_as_text(self, encoding="utf-8", **_kwargs):
+        return self._require().decode(encoding)
+
+    def download_to_filename(self, filename, **_kwargs):
+        with open(filename, "wb") as f:
+            f.write(self._require())
+
+    def delete(self, **_kwargs):
+        self.bucket.objects.pop(self.name, None)
+        self.bucket.properties.pop(self.name, None)
+
+class FakeBucket:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.objects = {}
+        self.properties = {}
+        self.lock = threading.Lock()
+
+    def blob(self, name, **_kwargs):
+        return FakeBlob(self, name)
+
+    def get_blob(self, name, **_kwargs):
+        if name not in self.objects:
+            return None
+        blob = FakeBlob(self, name)
+        blob.reload()
+        return blob
+
+    def list_blobs(self, prefix=None, **_kwargs):
+        return [FakeBlob(self, n) for n in sorted(self.objects) if n.startswith(prefix or "")]
+
+    def delete_blobs(self, blobs, **_kwargs):
+        for blob in blobs:
+            blob.delete()
+
+class FakeStorageClient:
+    buckets = {}
+    bytes_uploaded = 0
+
+    def __init__(self, *_args, **_kwargs):
+        pass
+
+    def bucket(self, name):
+        if name not in FakeStorageClient.buckets:
+            FakeStorageClient.buckets[name] = FakeBucket(self, name)
+        return FakeStorageClient.buckets[name]
+
+    def list_blobs(self, bucket, prefix=None, **_kwargs):
+        bucket = self.bucket(bucket) if isinstance(bucket, str) else bucket
+        return bucket.list_blobs(prefix=prefix)
+
+# --- Supabase ---
+
+EMBED = re.compile(r"(\w+)\(([^)]*)\)")
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+class FakeQuery:
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.filters = []
+        self.embeds = []
+        self.columns = None
+        self.order_by = None
+        self.is_single = False
+        self.insert_rows = None
+        self.limit_count = None
+
+    def select(self, columns="*", **_kwargs):
+        self.embeds = [(name, [c.strip() for c in cols.split(",")]) for name, cols in EMBED.findall(columns)]
+        plain = [c.strip() for c in EMBED.sub("", columns).split(",") if c.strip()]
+        self.columns = None if "*" in plain else plain
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and str(row[column]) >= str(value))
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and str(row[column]) < str(value))
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by = (column, desc)
+        return self
+
+    def limit(self, count):
+        self.limit_count = count
+        return self
+
+    def single(self):
+        self.is_single = True
+        return self
+
+    def insert(self, rows):
+        self.insert_rows = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows, **_kwargs):
+        return self.insert(rows)
+
+    def execute(self):
+        with self.db.lock:
+            self.db.queries += 1
+            if self.insert_rows is not None:
+                stored = []
+                for row in self.insert_rows:
+                    row = dict(row)
+                    row.setdefault("id", str(uuid.uuid4()))
+                    self.db.tables[self.table].append(row)
+                    stored.append(row)
+                return FakeResponse(stored)
+
+            rows = [r for r in self.db.tables[self.table] if all(f(r) for f in self.filters)]
+        if self.order_by:
+            column, desc = self.order_by
+            rows.sort(key=lambda r: str(r.get(column) or ""), reverse=desc)
+        if self.limit_count is not None:
+            rows = rows[:self.limit_count]
+        result = []
+        for row in rows:
+            out = dict(row) if self.columns is None else {c: row.get(c) for c in self.columns}
+            for name, cols in self.embeds:
+                related = [r for r in self.db.tables[name] if r.get(f"{self.table}_id") == row.get("id")]
+                out[name] = [{c: r.get(c) for c in cols} for r in related]
+            result.append(out)
+        if self.is_single:
+            return FakeResponse(result[0] if result else None)
+        return FakeResponse(result)
+
+class FakeSupabase:
+    def __init__(self):
+        self.tables = defaultdict(list)
+        self.lock = threading.Lock()
+        self.queries = 0
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+# --- Pub/Sub ---
+
+class FakeFuture:
+    def __init__(self, message_id):
+        self.message_id = message_id
+
+    # pylint: disable-next=unused-argument  # Same keywords as the real client
+    def result(self, timeout=None):
+        return self.message_id
+
+class FakeBus:
+    """Synchronous Pub/Sub: messages queue up until drain() delivers them to subscribers."""
+
+    def __init__(self):
+        self.queue = []
+        self.subscribers = defaultdict(list)
+        self.published = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def subscribe(self, topic, handler):
+        self.subscribers[topic].append(handler)
+
+    def publish(self, topic_path, data):
+        topic = topic_path.rsplit("/", 1)[-1]
+        with self.lock:
+            self.published[topic] += 1
+            message_id = str(self.published[topic])
+            self.queue.append((topic, data))
+        return FakeFuture(message_id)
+
+    def drain(self):
+        delivered = 0
+        while self.queue:
+            with self.lock:
+                topic, data = self.queue.pop(0)
+            event = {"data": base64.b64encode(data).decode("ascii")}
+            for handler in self.subscribers[topic]:
+                handler(event, SimpleNamespace(event_id=str(delivered)))
+            delivered += 1
+        return delivered
+
+BatchSettings = namedtuple("BatchSettings", ["max_bytes", "max_latency", "max_messages"],
+                           defaults=[1024 * 1024, 0.01, 100])
+
+class FakePublisherClient:
+    bus = None
+
+    def __init__(self, *_args, **_kwargs):
+        pass
+
+    def topic_path(self, project, topic):
+        return f"projects/{project}/topics/{topic}"
+
+    def publish(self, topic_path, data, **_attrs):
+        return FakePublisherClient.bus.publish(topic_path, data)
+
+# --- LLM / TTS / search stubs ---
+
+class FakeGenaiModels:
+    def __init__(self, config, corpus):
+        self.config = config
+        self.corpus = corpus
+
+    # pylint: disable-next=unused-argument  # Same keywords as the real client
+    def generate_content(self, model=None, contents=None, config=None, **_kwargs):
+        prompt = contents if isinstance(contents, str) else json.dumps(contents, default=str)
+        self.config.call("llm", self.config.llm_latency, self.config.llm_failure_rate, len(prompt))
+        doc = self.corpus[hash(prompt) % len(self.corpus)]
+        body = " ".join(doc["body"].split()[:80])
+        # Fill every string field of the requested structured-output schema
+        schema = (config or {}).get("response_json_schema") or {}
+        fields = schema.get("properties") or {"title": {}, "article_body": {}}
+        return SimpleNamespace(text=json.dumps({
+            name: doc["title"] if name == "title" else f"{body} ({name})" for name in fields
+        }))
+
+class FakeGenaiClient:
+    config = None
+    corpus: list = []
+
+    def __init__(self, *_args, **_kwargs):
+        self.models = FakeGenaiModels(FakeGenaiClient.config, FakeGenaiClient.corpus)
+
+class FakeTextToSpeechClient:
+    config = None
+
+    def __init__(self, *_args, **_kwargs):
+        pass
+
+    # pylint: disable-next=redefined-builtin,unused-argument  # Same keywords as the real client
+    def synthesize_speech(self, input=None, voice=None, audio_config=None, **_kwargs):
+        text = getattr(input, "text", "") or ""
+        cfg = FakeTextToSpeechClient.config
+        cfg.call("gemini_tts", cfg.tts_latency, cfg.tts_failure_rate, len(text))
+        return SimpleNamespace(audio_content=silent_mp3(len(text) / cfg.chars_per_second))
+
+class FakeElevenLabs:
+    config = None
+
+    def __init__(self, *_args, **_kwargs):
+        self.text_to_speech = self
+
+    def convert(self, text="", **_kwargs):
+        cfg = FakeElevenLabs.config
+        cfg.call("elevenlabs", cfg.tts_latency, cfg.tts_failure_rate, len(text))
+        data = silent_mp3(len(text) / cfg.chars_per_second)
+        return (data[i:i + 4096] for i in range(0, len(data), 4096))
+
+class FakeRequestException(Exception):
+    pass
+
+class FakeHttpResponse:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.encoding = "utf-8"
+        self.apparent_encoding = "utf-8"
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise FakeRequestException(f"{self.status_code} error")
+
+class FakeHttpSession:
+    """Serves article pages built from the corpus; the URL's last path segment picks the document."""
+    config = None
+    corpus: list = []
+
+    def __init__(self):
+        self.headers = {}
+
+    def mount(self, prefix, adapter):
+        pass
+
+    # pylint: disable-next=unused-argument  # Same keywords as the real client
+    def get(self, url, headers=None, timeout=None, **_kwargs):
+        cfg = FakeHttpSession.config
+        cfg.call("http", cfg.http_latency, 0.0)
+        try:
+            index = int(url.rstrip("/").rsplit("/", 1)[-1])
+        except ValueError:
+            return FakeHttpResponse(404)
+        etag = f'"{index}"'
+        if (headers or {}).get("If-None-Match") == etag:
+            return FakeHttpResponse(304, headers={"ETag": etag})
+        doc = self.corpus[index % len(self.corpus)]
+        paragraphs = "".join(f"<p>{escape(line)}</p>" for line in doc["body"].split("\n") if line.strip())
+        title = escape(doc["title"])
+        page = (f"<html><head><title>{title} | Example</title></head><body>"
+                f"<nav><a href='/'>Home</a><a href='/news'>News</a></nav>"
+                f"<article><h1>{title}</h1>{paragraphs}</article>"
+                f"<footer>Copyright Example</footer></body></html>")
+        return FakeHttpResponse(200, page.encode("utf-8"), {"ETag": etag})
+
+class FakePerplexity:
+    config = None
+    corpus: list = []
+    results_per_query = 3
+
+    def __init__(self, *_args, **_kwargs):
+        self.chat = SimpleNamespace(completions=self)
+        self.cursor = 0
+
+    # pylint: disable-next=unused-argument  # Same keywords as the real client
+    def create(self, model=None, messages=None, **_kwargs):
+        cfg = FakePerplexity.config
+        prompt = messages[-1]["content"] if messages else ""
+        cfg.call("perplexity", cfg.llm_latency, cfg.llm_failure_rate, len(prompt))
+        url_match = re.search(r"https?://\S+", prompt)
+        if url_match:
+            index = int(url_match.group(0).rstrip(".:,").rsplit("/", 1)[-1]) % len(self.corpus)
+            doc = self.corpus[index]
+            content = f"# {doc['title']}\n\n{doc['body']}"
+            return SimpleNamespace(search_results=[], choices=[
+                SimpleNamespace(message=SimpleNamespace(content=content))])
+        results = []
+        for _ in range(self.results_per_query):
+            index = self.cursor
+            self.cursor += 1
+            doc = self.corpus[index % len(self.corpus)]
+            results.append(SimpleNamespace(
+                url=f"https://example.com/articles/{index}", title=doc["title"],
+                snippet=doc["body"][:200], date=datetime.now(timezone.utc).isoformat(),
+            ))
+        return SimpleNamespace(search_results=results, choices=[
+            SimpleNamespace(message=SimpleNamespace(content="Summary."))])
+
+class FeedEntry(dict):
+    """Dict with attribute access, like feedparser's FeedParserDict."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError as e:
+            raise AttributeError(name) from e
+
+def fake_feed_parse(corpus, keywords):
+    """feedparser.parse stand-in serving corpus items as headlines that pass the keyword filter."""
+    def parse(url, *_args, **_kwargs):
+        entries = []
+        for i, doc in enumerate(corpus):
+            keyword = keywords[i % len(keywords)] if keywords else ""
+            entries.append(FeedEntry({
+                "title": f"{keyword}: {doc['title']}",
+                "guid": f"{url}#{doc['id']}",
+                "link": f"https://example.com/feed/{doc['id']}",
+                "published_parsed": time.gmtime(time.time() - i * 60),
+                "description": doc["body"][:200],
+            }))
+        return SimpleNamespace(entries=entries)
+    return parse
+
+# --- pydub stand-in (real pydub needs ffmpeg for MP3) ---
+
+class FakeAudioSegment:
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    @classmethod
+    def _read(cls, source):
+        if hasattr(source, "read"):
+            return cls(mp3_duration(source.read()))
+        with open(source, "rb") as f:
+            return cls(mp3_duration(f.read()))
+
+    @classmethod
+    def from_mp3(cls, source):
+        return cls._read(source)
+
+    @classmethod
+    # pylint: disable-next=redefined-builtin,unused-argument  # Same keywords as the real client
+    def from_file(cls, source, format=None, **_kwargs):
+        return cls._read(source)
+
+    @property
+    def duration_seconds(self):
+        return self.seconds
+
+    def __len__(self):
+        return int(self.seconds * 1000)
+
+    def __getitem__(self, item):
+        stop = item.stop if isinstance(item, slice) and item.stop is not None else len(self)
+        return FakeAudioSegment(min(stop, len(self)) / 1000)
+
+    def __mul__(self, times):
+        return FakeAudioSegment(self.seconds * times)
+
+    def __sub__(self, _db):
+        return self
+
+    def __add__(self, other):
+        return FakeAudioSegment(self.seconds + getattr(other, "seconds", 0))
+
+    def overlay(self, _other, **_kwargs):
+        return self
+
+    def set_frame_rate(self, _rate):
+        return self
+
+    def set_channels(self, _channels):
+        return self
+
+    # pylint: disable-next=redefined-builtin,unused-argument  # Same keywords as the real client
+    def export(self, out_f, format="mp3", **_kwargs):
+        data = silent_mp3(self.seconds)
+        if hasattr(out_f, "write"):
+            out_f.write(data)
+        else:
+            with open(out_f, "wb") as f:
+                f.write(data)
+        return out_f
+
+# --- Installation ---
+
+def _module(name, **attrs):
+    module = sys.modules.get(name) or ModuleType(name)
+    for key, value in attrs.items():
+        setattr(module, key, value)
+    sys.modules[name] = module
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(_module(parent), child, module)
+    return module
+
+def install_fakes(config: FakeConfig, corpus: list, keywords=(), fake_audio=True) -> SimpleNamespace:
+    """Register the fakes in sys.modules. Must run before the pipeline modules are imported."""
+    supabase = FakeSupabase()
+    bus = FakeBus()
+    FakeStorageClient.buckets = {}
+    FakeStorageClient.bytes_uploaded = 0
+    FakePublisherClient.bus = bus
+    FakeGenaiClient.config = FakeTextToSpeechClient.config = config
+    FakeElevenLabs.config = FakePerplexity.config = config
+    FakeGenaiClient.corpus = FakePerplexity.corpus = corpus
+    FakeHttpSession.config = config
+    FakeHttpSession.corpus = corpus
+
+    _module("supabase", create_client=lambda url, key: supabase, Client=FakeSupabase)
+    _module("google.cloud.storage", Client=FakeStorageClient)
+    _module("google.cloud.pubsub_v1", PublisherClient=FakePublisherClient,
+            types=SimpleNamespace(BatchSettings=BatchSettings))
+    _module("google.genai", Client=FakeGenaiClient)
+    _module("google.genai.types", GenerateContentConfig=dict)
+    _module("google.api_core.client_options", ClientOptions=SimpleNamespace)
+    _module("google.cloud.texttospeech_v1beta1",
+            TextToSpeechClient=FakeTextToSpeechClient,
+            SynthesisInput=SimpleNamespace,
+            VoiceSelectionParams=SimpleNamespace,
+            AudioConfig=SimpleNamespace,
+            AudioEncoding=SimpleNamespace(MP3="MP3"))
+    _module("elevenlabs", VoiceSettings=SimpleNamespace)
+    _module("elevenlabs.client", ElevenLabs=FakeElevenLabs)
+    _module("perplexity", Perplexity=FakePerplexity)
+    _module("openai", OpenAI=lambda *_args, **_kwargs: SimpleNamespace())
+    _module("feedparser", parse=fake_feed_parse(corpus, list(keywords)))
+    _module("requests", Session=FakeHttpSession, RequestException=FakeRequestException)
+    _module("requests.adapters", HTTPAdapter=SimpleNamespace)
+    if fake_audio:
+        _module("pydub", AudioSegment=FakeAudioSegment)
+
+    return SimpleNamespace(supabase=supabase, bus=bus, storage=FakeStorageClient(), config=config)
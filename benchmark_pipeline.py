@@ -0,0 +1,221 @@
+"""
+End-to-end benchmark for the whole pipeline against in-process fakes.
+
+Drives scrape_and_save_articles -> generate_audio_for_article -> generate_rss_feed
+through a synchronous Pub/Sub bus, then main.entry_point, and reports items per
+minute, p95 latency per stage and peak traced memory.
+
+    python benchmark_pipeline.py --items 30 --tts-latency 0.2 --json-out bench.json
+    python benchmark_pipeline.py --baseline bench.json   # exits 1 on a regression
+"""
+import os
+import sys
+import json
+import math
+import time
+import logging
+import argparse
+import tempfile
+import importlib
+import tracemalloc
+from collections import defaultdict
+
+import benchmark_fakes
+from benchmark_fakes import FakeConfig, install_fakes
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+PODCAST_ID = "76f55288-cd16-4b2c-892a-89e1aeac5b27"
+PIPELINE_MODULES = ("article_fetcher", "scrape_and_save_articles", "generate_audio_for_article_function",
+                    "generate_rss_feed", "main")
+
+def load_corpus(requests_path: str, items: int) -> list:
+    """Article texts seeded from requests.jsonl, repeated or synthesized up to `items` entries."""
+    docs = []
+    if os.path.exists(requests_path):
+        with open(requests_path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    docs.append({"title": record["title"], "body": record["body"]})
+    if not docs:
+        docs = [{"title": f"Markets update {i}",
+                 "body": "Stocks rose, bonds slipped and the forint firmed. " * 20} for i in range(10)]
+    return [dict(docs[i % len(docs)], id=f"item-{i}") for i in range(items)]
+
+def load_history(history_path: str) -> list:
+    if os.path.exists(history_path):
+        with open(history_path, encoding="utf-8") as f:
+            return json.load(f)
+    return []
+
+def p95(values: list) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)]
+
+class StageTimer:
+    """Wraps pipeline functions to record per-call latency and failures."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.failures = defaultdict(int)
+
+    def wrap(self, stage, fn, none_is_failure=False):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                self.failures[stage] += 1
+                raise
+            finally:
+                self.latencies[stage].append(time.perf_counter() - start)
+            if none_is_failure and result is None:
+                self.failures[stage] += 1
+            return result
+        return timed
+
+    def report(self) -> dict:
+        return {
+            stage: {
+                "calls": len(values),
+                "failures": self.failures[stage],
+                "p50_seconds": round(sorted(values)[len(values) // 2], 4),
+                "p95_seconds": round(p95(values), 4),
+            }
+            for stage, values in self.latencies.items()
+        }
+
+def import_pipeline():
+    """(Re)import the Cloud Function modules so they bind to the installed fakes."""
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+    modules = {}
+    for name in PIPELINE_MODULES:
+        module = sys.modules.get(name)
+        modules[name] = importlib.reload(module) if module else importlib.import_module(name)
+    return modules
+
+def run_benchmark(items: int, config: FakeConfig, requests_path: str, history_path: str,
+                  fake_audio: bool = True) -> dict:
+    corpus = load_corpus(requests_path, items)
+    benchmark_fakes.FakePerplexity.results_per_query = max(1, math.ceil(items / 10))
+
+    tracemalloc.start()
+    fakes = install_fakes(config, corpus, keywords=["Breaking", "Record", "Surge", "Rate"],
+                          fake_audio=fake_audio)
+    fakes.supabase.tables["podcast"].append({
+        "id": PODCAST_ID, "title": "Benchmark", "homepage_url": "https://example.com",
+        "description": "Benchmark feed", "image_url": "https://example.com/cover.png",
+        "author": "Benchmark", "explicit": False, "language": "hu", "owner_email": "bench@example.com",
+        "category": "News",
+    })
+    # Fresh HTTP cache so every run starts cold
+    os.environ["FETCH_CACHE_DIR"] = tempfile.mkdtemp(prefix="bench_http_cache_")
+    modules = import_pipeline()
+    engine = modules["main"]
+    fakes.storage.bucket(engine.BUCKET_NAME).blob("history.json").upload_from_string(
+        json.dumps(load_history(history_path)))
+
+    timer = StageTimer()
+    fakes.bus.subscribe("articles-saved", timer.wrap(
+        "generate_audio_for_article", modules["generate_audio_for_article_function"].generate_audio_for_article))
+    fakes.bus.subscribe("audio-generated", timer.wrap(
+        "generate_rss_feed", modules["generate_rss_feed"].generate_rss_feed))
+
+    # Flow 1: Perplexity scrape -> audio -> RSS, chained through the bus
+    start = time.perf_counter()
+    timer.wrap("scrape_and_save_articles", modules["scrape_and_save_articles"].scrape_and_save_articles)(None)
+    fakes.bus.drain()
+    scrape_seconds = time.perf_counter() - start
+    articles = len(fakes.supabase.tables["article"])
+    audio_files = len(fakes.supabase.tables["audio_file"])
+
+    # Flow 2: RSS headlines -> LLM script -> Gemini TTS -> post-processing
+    engine.process_single_item = timer.wrap("process_single_item", engine.process_single_item, none_is_failure=True)
+    start = time.perf_counter()
+    timer.wrap("entry_point", engine.entry_point)(None)
+    engine_seconds = time.perf_counter() - start
+    news_items = len(fakes.storage.bucket(engine.BUCKET_NAME).list_blobs(prefix="news/news_"))
+
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "items": items,
+        "flows": {
+            "scrape_to_rss": {
+                "seconds": round(scrape_seconds, 3),
+                "articles": articles,
+                "audio_files": audio_files,
+                "items_per_minute": round(audio_files / scrape_seconds * 60, 2) if scrape_seconds else 0.0,
+            },
+            "news_engine": {
+                "seconds": round(engine_seconds, 3),
+                "news_items": news_items,
+                "items_per_minute": round(news_items / engine_seconds * 60, 2) if engine_seconds else 0.0,
+            },
+        },
+        "stages": timer.report(),
+        "backend_calls": dict(config.calls),
+        "backend_chars": dict(config.chars),
+        "bytes_uploaded": fakes.storage.bytes_uploaded,
+        "db_queries": fakes.supabase.queries,
+        "peak_memory_mb": round(peak_bytes / (1024 * 1024), 2),
+    }
+
+def find_regressions(report: dict, baseline: dict, tolerance: float) -> list:
+    """Compare throughput, p95 latency and peak memory against a previous report."""
+    problems = []
+    for flow, current in report["flows"].items():
+        previous = baseline.get("flows", {}).get(flow)
+        if previous and current["items_per_minute"] < previous["items_per_minute"] * (1 - tolerance):
+            problems.append(f"{flow}: {current['items_per_minute']} items/min "
+                            f"(baseline {previous['items_per_minute']})")
+    for stage, current in report["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if previous and current["p95_seconds"] > previous["p95_seconds"] * (1 + tolerance):
+            problems.append(f"{stage}: p95 {current['p95_seconds']}s (baseline {previous['p95_seconds']}s)")
+    previous_peak = baseline.get("peak_memory_mb")
+    if previous_peak and report["peak_memory_mb"] > previous_peak * (1 + tolerance):
+        problems.append(f"peak memory {report['peak_memory_mb']} MB (baseline {previous_peak} MB)")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=30)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--tts-latency", type=float, default=0.2)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--tts-failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", default=os.path.join(REPO_DIR, "requests.jsonl"))
+    parser.add_argument("--history", default=os.path.join(REPO_DIR, "history.json"))
+    parser.add_argument("--real-audio", action="store_true", help="Use the installed pydub (needs ffmpeg)")
+    parser.add_argument("--json-out", help="Write the report to this file")
+    parser.add_argument("--baseline", help="Previous report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    config = FakeConfig(llm_latency=args.llm_latency, tts_latency=args.tts_latency,
+                        llm_failure_rate=args.llm_failure_rate, tts_failure_rate=args.tts_failure_rate,
+                        seed=args.seed)
+    report = run_benchmark(args.items, config, args.requests, args.history, fake_audio=not args.real_audio)
+    print(json.dumps(report, indent=2))
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            problems = find_regressions(report, json.load(f), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}", file=sys.stderr)
+        if problems:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
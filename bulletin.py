@@ -0,0 +1,97 @@
+"""
+Top-of-the-hour bulletin: joins the per-item news MP3s into one continuous
+file at the frame level (no decode/re-encode), with a stinger or silence
+between items, a Xing header for seeking and a chapter index. The LAME tag
+carries the first item's encoder delay and the last item's padding; joints
+between items keep theirs, which is inaudible next to the gap. The stinger
+(assets/stinger.mp3) is used only when its format matches the items.
+"""
+import os
+import json
+import logging
+from typing import List, NamedTuple, Optional, Tuple
+
+import mp3_frames
+
+logger = logging.getLogger(__name__)
+
+BULLETIN_ENABLED = os.getenv("BULLETIN_ENABLED", "1") == "1"
+BULLETIN_NAME = "bulletin.mp3"
+CHAPTERS_NAME = "bulletin_chapters.json"
+STINGER_BLOB = "assets/stinger.mp3"  # Must be encoded at the items' sample rate
+GAP_SECONDS = float(os.getenv("BULLETIN_GAP_SECONDS", "0.5"))  # Silence when there is no stinger
+
+class Bulletin(NamedTuple):
+    audio: bytes
+    chapters: dict
+    duration: float
+
+def build_bulletin(parts: List[Tuple[str, bytes]], stinger: Optional[bytes] = None) -> Bulletin:
+    """
+    Concatenate (title, mp3 bytes) parts into one MP3. Parts whose sample rate
+    or channel mode doesn't match the first part are skipped, since they can't
+    share a stream.
+    """
+    frames, chapters = [], []
+    template = None
+    gap = []
+    elapsed = 0.0
+    edges = []  # (encoder delay, padding) of each part used
+
+    for title, data in parts:
+        header = mp3_frames.first_header(data)
+        if header is None:
+            logger.warning(f"Bulletin: no MP3 frames in '{title}', skipping.")
+            continue
+        if template is None:
+            template = header
+            stinger_header = mp3_frames.first_header(stinger) if stinger else None
+            if stinger_header and stinger_header.compatible(template):
+                gap = mp3_frames.audio_frames(stinger)
+            else:
+                if stinger:
+                    logger.warning("Bulletin: stinger format doesn't match the items; using silence.")
+                gap = mp3_frames.silence(template, GAP_SECONDS)
+        elif not header.compatible(template):
+            logger.warning(f"Bulletin: '{title}' is {header.sample_rate} Hz, channel mode {header.channel_mode}; "
+                           f"expected {template.sample_rate} Hz, channel mode {template.channel_mode}; skipping.")
+            continue
+
+        if chapters:
+            frames.extend(gap)
+            elapsed += len(gap) * template.duration
+        chapters.append({"startTime": round(elapsed, 3), "title": title})
+        item_frames = mp3_frames.audio_frames(data)
+        frames.extend(item_frames)
+        edges.append(mp3_frames.gapless_info(data) or (0, 0))
+        elapsed += len(item_frames) * template.duration
+
+    if template is None:
+        return Bulletin(b"", {"version": "1.2.0", "chapters": []}, 0.0)
+
+    xing = mp3_frames.xing_frame(template, [len(f) for f in frames], (edges[0][0], edges[-1][1]))
+    audio = b"".join([xing, *frames])
+    return Bulletin(audio, {"version": "1.2.0", "chapters": chapters}, round(elapsed, 3))
+
+def publish_bulletin(bucket, entries: List[Tuple[str, str]], prefix: str = "news") -> Optional[Bulletin]:
+    """Build the bulletin from (title, local mp3 path) entries and upload it with its chapters under prefix."""
+    parts = []
+    for title, path in entries:
+        with open(path, "rb") as f:
+            parts.append((title, f.read()))
+
+    stinger_blob = bucket.blob(STINGER_BLOB)
+    stinger = stinger_blob.download_as_bytes() if stinger_blob.exists() else None
+
+    bulletin = build_bulletin(parts, stinger)
+    if not bulletin.audio:
+        logger.warning("Bulletin: nothing to assemble.")
+        return None
+
+    bucket.blob(f"{prefix}/{BULLETIN_NAME}").upload_from_string(bulletin.audio, content_type="audio/mpeg")
+    bucket.blob(f"{prefix}/{CHAPTERS_NAME}").upload_from_string(
+        json.dumps(bulletin.chapters, ensure_ascii=False), content_type="application/json+chapters"
+    )
+    logger.info(f"Bulletin uploaded to {prefix}/: {len(bulletin.chapters['chapters'])} items, "
+                f"{bulletin.duration:.0f}s, {len(bulletin.audio)} bytes.")
+    return bulletin
@@ -0,0 +1,39 @@
+"""
+Publishing of static, CDN-cached objects (feeds, indexes) to GCS: gzip
+content encoding, explicit Cache-Control and a content hash in the object
+metadata, so unchanged documents are not re-uploaded and keep their ETag.
+"""
+import gzip
+import hashlib
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+HASH_METADATA_KEY = "content-sha256"
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def publish(bucket, name: str, data: bytes, content_type: str, cache_control: str,
+            hash_data: Optional[bytes] = None) -> bool:
+    """
+    Upload data gzip-encoded under name, unless the stored object already has
+    the same content hash. hash_data is what gets hashed when the document has
+    volatile parts (e.g. a build timestamp) that shouldn't force a new upload.
+    Returns True if the object was uploaded.
+    """
+    digest = content_hash(data if hash_data is None else hash_data)
+    current = bucket.get_blob(name)
+    if current is not None and (current.metadata or {}).get(HASH_METADATA_KEY) == digest:
+        logger.info(f"{name} unchanged ({digest[:12]}), upload skipped.")
+        return False
+
+    blob = bucket.blob(name)
+    blob.content_encoding = "gzip"
+    blob.cache_control = cache_control
+    blob.metadata = {HASH_METADATA_KEY: digest}
+    # mtime=0 keeps the compressed bytes identical for identical content
+    blob.upload_from_string(gzip.compress(data, compresslevel=9, mtime=0), content_type=content_type)
+    logger.info(f"{name} uploaded ({len(data)} bytes, gzip).")
+    return True
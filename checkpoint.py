@@ -0,0 +1,221 @@
+"""
+Per-run checkpoint manifest for the news engine, stored in GCS.
+Records each item's stage outputs (scripts, then a raw and a final audio blob
+per language) so a re-invocation after a timeout or crash resumes every item from its last
+completed stage instead of starting over. Stage changes are flushed to GCS
+every CHECKPOINT_FLUSH_SECONDS by a background thread, never while holding
+the manifest lock.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_BLOB = "runs/active.json"
+RUNS_PREFIX = "runs"
+CHECKPOINT_FLUSH_SECONDS = float(os.getenv("CHECKPOINT_FLUSH_SECONDS", "5"))
+CHECKPOINT_RETRIES = 5
+
+# Item stages in order; each one implies all earlier ones are done
+STAGES = ("pending", "script", "raw", "final", "published")
+
+def _is_precondition_failure(error: Exception) -> bool:
+    return type(error).__name__ == "PreconditionFailed" or "412" in str(error)
+
+class RunCheckpoint:
+    def __init__(self, bucket, manifest: dict, generation: int = 0):
+        self.bucket = bucket
+        self.manifest = manifest
+        self.generation = generation  # Of the stored manifest; 0 while it doesn't exist yet
+        self.lock = threading.Lock()  # Guards the manifest
+        self.flush_lock = threading.Lock()  # One upload at a time, in order
+        self.version = 0  # Bumped on every change
+        self.flushed = 0  # Last version stored in GCS
+        self.flusher = None
+        self.stop = threading.Event()
+        self.closed = False  # Set when the run stops; stragglers finishing later must not record
+
+    def close(self):
+        """Stop recording stage changes and flush; the run's results are being read."""
+        with self.lock:
+            self.closed = True
+        self.stop.set()
+        if self.flusher:
+            self.flusher.join()
+        self.flush()
+
+    @property
+    def run_id(self) -> str:
+        return self.manifest["run_id"]
+
+    @classmethod
+    def load(cls, bucket) -> Optional["RunCheckpoint"]:
+        """The unfinished run left by a previous invocation, if any."""
+        blob = bucket.blob(MANIFEST_BLOB)
+        if not blob.exists():
+            return None
+        blob.reload()
+        manifest = json.loads(blob.download_as_string())
+        logger.info(f"Resuming run {manifest['run_id']} with {len(manifest['items'])} items.")
+        return cls(bucket, manifest, blob.generation or 0)
+
+    @classmethod
+    def start(cls, bucket) -> "RunCheckpoint":
+        now = datetime.now(timezone.utc)
+        manifest = {"run_id": now.strftime("%Y%m%dT%H%M%SZ"), "started": now.isoformat(), "items": {}}
+        return cls(bucket, manifest)
+
+    def save(self):
+        """Mark the manifest changed. Callers hold self.lock; the upload happens later, outside it."""
+        self.version += 1
+        if self.flusher is None and not self.closed:
+            self.flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+            self.flusher.start()
+
+    def _flush_periodically(self):
+        while not self.stop.wait(CHECKPOINT_FLUSH_SECONDS):
+            self.flush()
+
+    def _merge(self, remote: dict):
+        """Keep the furthest stage of each item from our manifest and one written concurrently."""
+        if remote.get("run_id") != self.run_id:
+            return False
+        for guid, theirs in remote["items"].items():
+            ours = self.manifest["items"].get(guid)
+            if ours is None or STAGES.index(theirs["stage"]) > STAGES.index(ours["stage"]):
+                self.manifest["items"][guid] = theirs
+        self.version += 1
+        return True
+
+    def flush(self) -> bool:
+        """
+        Store the manifest if it changed since the last flush. Uploads carry a
+        generation precondition; a concurrent writer's manifest is merged in and
+        the upload retried, other errors are retried with backoff.
+        """
+        with self.flush_lock:
+            blob = self.bucket.blob(MANIFEST_BLOB)
+            for attempt in range(CHECKPOINT_RETRIES):
+                with self.lock:
+                    if self.version == self.flushed:
+                        return True
+                    version = self.version
+                    data = json.dumps(self.manifest, ensure_ascii=False)
+                try:
+                    blob.upload_from_string(data, content_type="application/json",
+                                            if_generation_match=self.generation)
+                    self.generation = blob.generation or self.generation + 1
+                    self.flushed = version
+                except Exception as e:
+                    if not _is_precondition_failure(e):
+                        logger.warning(f"Checkpoint flush failed (attempt {attempt + 1}): {e}")
+                        time.sleep(min(10.0, 0.5 * 2 ** attempt))
+                        continue
+                    if not blob.exists():
+                        self.generation = 0  # Deleted meanwhile; recreate it
+                        continue
+                    blob.reload()
+                    remote = json.loads(blob.download_as_string())
+                    with self.lock:
+                        merged = self._merge(remote)
+                    if not merged:
+                        logger.error(f"Checkpoint {MANIFEST_BLOB} now belongs to run {remote.get('run_id')}; "
+                                     f"not overwriting it with run {self.run_id}.")
+                        return False
+                    self.generation = blob.generation or 0
+                    logger.info(f"Merged a concurrent update of run {self.run_id}'s checkpoint.")
+            logger.error(f"Could not store the checkpoint for run {self.run_id}.")
+            return False
+
+    def blob_path(self, name: str) -> str:
+        return f"{RUNS_PREFIX}/{self.run_id}/{name}"
+
+    def has(self, guid: str) -> bool:
+        return guid in self.manifest["items"]
+
+    def has_items(self) -> bool:
+        with self.lock:
+            return bool(self.manifest["items"])
+
+    def add_items(self, items: List[dict]):
+        """Add new items after the existing ones, numbering them in order."""
+        with self.lock:
+            entries = self.manifest["items"]
+            next_index = max([e["index"] for e in entries.values()] + [0]) + 1
+            for item in items:
+                entries[item["guid"]] = {"index": next_index, "item": item, "stage": "pending", "failures": 0}
+                next_index += 1
+            self.save()
+
+    def get(self, guid: str) -> dict:
+        with self.lock:
+            return dict(self.manifest["items"][guid])
+
+    def render(self, guid: str, language: str) -> dict:
+        """Stage and outputs of one language's render of an item."""
+        with self.lock:
+            renders = self.manifest["items"][guid].get("renders", {})
+            return dict(renders.get(language, {"stage": "script"}))
+
+    def reached(self, guid: str, stage: str, language: Optional[str] = None) -> bool:
+        current = self.render(guid, language)["stage"] if language else self.get(guid)["stage"]
+        return STAGES.index(current) >= STAGES.index(stage)
+
+    def record(self, guid: str, stage: str, language: Optional[str] = None, **outputs):
+        """
+        Mark a stage complete with its outputs and persist the manifest. With a
+        language, the stage applies to that language's render only.
+        """
+        with self.lock:
+            if self.closed:
+                logger.warning(f"Ignoring {stage} for {guid} recorded after the run stopped.")
+                return
+            entry = self.manifest["items"][guid]
+            if language:
+                entry = entry.setdefault("renders", {}).setdefault(language, {})
+            entry.update(outputs)
+            entry["stage"] = stage
+            self.save()
+
+    def record_failure(self, guid: str) -> int:
+        with self.lock:
+            entry = self.manifest["items"][guid]
+            entry["failures"] += 1
+            failures = entry["failures"]
+            self.save()
+        if self.closed:
+            self.flush()
+        return failures
+
+    def drop(self, guid: str):
+        with self.lock:
+            self.manifest["items"].pop(guid, None)
+            self.save()
+        if self.closed:
+            self.flush()
+
+    def _entries(self, published: bool) -> List[dict]:
+        with self.lock:
+            entries = [dict(e) for e in self.manifest["items"].values()
+                       if (e["stage"] == "published") == published]
+        return sorted(entries, key=lambda e: e["index"])
+
+    def pending_items(self) -> List[dict]:
+        """Unpublished items in index (priority) order."""
+        return [e["item"] for e in self._entries(published=False)]
+
+    def published(self) -> List[dict]:
+        return self._entries(published=True)
+
+    def finish(self):
+        """Delete the run's intermediate blobs and the manifest once every item is published."""
+        self.close()
+        blobs = list(self.bucket.list_blobs(prefix=f"{RUNS_PREFIX}/{self.run_id}/"))
+        self.bucket.delete_blobs(blobs)
+        self.bucket.blob(MANIFEST_BLOB).delete()
+        logger.info(f"Run {self.run_id} complete.")
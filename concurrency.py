@@ -0,0 +1,119 @@
+"""
+AIMD concurrency limiters for quota-bound backends (Vertex AI, TTS).
+Concurrency ramps up additively while calls succeed and backs off
+multiplicatively on quota or deadline errors. Quota (429) errors become
+QuotaExceeded, so the scheduler requeues the item with backoff; overload
+errors (503, 504, deadline) still count against circuit breakers. Limits and
+throttle counts end up in the run metrics (stats/last_run.json).
+"""
+import time
+import threading
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Exception class names and message fragments that mean "slow down", across google-api-core and genai
+QUOTA_ERROR_NAMES = ("ResourceExhausted", "TooManyRequests")
+QUOTA_ERROR_MARKERS = ("429", "RESOURCE_EXHAUSTED", "Quota exceeded", "quota exceeded")
+# Overload and timeouts: the limit still backs off, but these are failures, not throttling
+OVERLOAD_ERROR_NAMES = ("DeadlineExceeded", "ServiceUnavailable", "GatewayTimeout")
+OVERLOAD_ERROR_MARKERS = ("DEADLINE_EXCEEDED", "UNAVAILABLE", "503 ", "504 ")
+
+class QuotaExceeded(Exception):
+    """A backend throttled the call; the item should be retried later, not dropped."""
+
+class RetryAfter(Exception):
+    """The call wasn't attempted; retry the item no sooner than retry_after seconds from now."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def is_quota_error(error: Exception) -> bool:
+    if type(error).__name__ in QUOTA_ERROR_NAMES:
+        return True
+    if getattr(error, "code", None) == 429:
+        return True
+    message = str(error)
+    return any(marker in message for marker in QUOTA_ERROR_MARKERS)
+
+def is_overload_error(error: Exception) -> bool:
+    if type(error).__name__ in OVERLOAD_ERROR_NAMES:
+        return True
+    if getattr(error, "code", None) in (503, 504):
+        return True
+    message = str(error)
+    return any(marker in message for marker in OVERLOAD_ERROR_MARKERS)
+
+class AdaptiveLimiter:
+    """Additive-increase / multiplicative-decrease limit on in-flight calls."""
+
+    def __init__(self, name: str, initial: int, min_limit: int = 1, max_limit: int = 20,
+                 increase: float = 1.0, decrease: float = 0.5):
+        self.name = name
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.in_flight = 0
+        self.successes = 0
+        self.throttles = 0
+        self.peak_limit = self.limit
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, outcome: str = "success", started: float = None):
+        """outcome is "success", "throttled" or "error"; errors leave the limit unchanged."""
+        with self.condition:
+            self.in_flight -= 1
+            if outcome == "throttled":
+                self.throttles += 1
+                # One back-off per congestion event: calls already in flight when
+                # the limit last dropped don't shrink it again
+                if started is None or started >= self.last_decrease:
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                    self.last_decrease = time.monotonic()
+                    logger.warning(f"{self.name}: throttled, concurrency limit down to {int(self.limit)}")
+            elif outcome == "success":
+                self.successes += 1
+                # +increase per full window of successful calls
+                self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+                self.peak_limit = max(self.peak_limit, self.limit)
+            self.condition.notify_all()
+
+    @contextmanager
+    def slot(self):
+        """
+        Hold one slot for a backend call. Quota errors shrink the limit and raise
+        QuotaExceeded; overload errors shrink it too but propagate as failures.
+        """
+        self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            if is_quota_error(e):
+                self.release("throttled", started)
+                raise QuotaExceeded(f"{self.name}: {e}") from e
+            # Overload means less capacity too; other failures say nothing about it
+            self.release("throttled" if is_overload_error(e) else "error", started)
+            raise
+        else:
+            self.release()
+
+    def metrics(self) -> dict:
+        with self.condition:
+            return {
+                "limit": int(self.limit),
+                "peak_limit": int(self.peak_limit),
+                "successes": self.successes,
+                "throttles": self.throttles,
+            }
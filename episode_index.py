@@ -0,0 +1,106 @@
+"""
+Static episode index for web and mobile clients: the RSS feed's episodes as
+compact, versioned JSON (and MessagePack when installed). A head document
+covers the feed's window and per-day shards cover completed UTC days
+(rewritten only when a day's episodes change), so clients read cacheable objects instead of querying Supabase.
+The head links the latest shards and each shard its predecessor through "prev".
+Documents carry a version; an incompatible change moves to a new v<N>/ prefix.
+"""
+import os
+import json
+import logging
+from datetime import date, datetime, timezone
+from typing import Dict, List
+
+# Optional binary encoding; JSON is always written
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+import cdn
+
+INDEX_VERSION = 1  # Bumped on incompatible schema changes; old versions stay under their own prefix
+INDEX_PREFIX = f"audio/rss/index/v{INDEX_VERSION}"
+INDEX_CACHE_CONTROL = os.getenv("INDEX_CACHE_CONTROL", "public, max-age=300")
+SHARD_CACHE_CONTROL = "public, max-age=86400"
+INDEX_HEAD_DAYS = 30  # Shards listed in the head document
+
+CONTENT_TYPES = {"json": "application/json; charset=utf-8", "msgpack": "application/msgpack"}
+INDEX_FORMATS = [f.strip() for f in os.getenv("INDEX_FORMATS", "json").split(",") if f.strip()]
+if "msgpack" in INDEX_FORMATS and msgpack is None:
+    logging.warning("INDEX_FORMATS includes msgpack but the msgpack package is not installed; writing JSON only.")
+    INDEX_FORMATS = [f for f in INDEX_FORMATS if f != "msgpack"]
+if "json" not in INDEX_FORMATS:
+    INDEX_FORMATS.insert(0, "json")
+
+def head_name(fmt: str) -> str:
+    return f"{INDEX_PREFIX}/latest.{fmt}"
+
+def shard_name(day, fmt: str) -> str:
+    return f"{INDEX_PREFIX}/days/{day.isoformat()}.{fmt}"
+
+def compact(record: Dict) -> Dict:
+    """Drop empty fields; clients treat missing keys as absent."""
+    return {key: value for key, value in record.items() if value not in (None, "", [])}
+
+def podcast_summary(podcast_info) -> Dict:
+    return compact({
+        "title": podcast_info.get("title"),
+        "link": podcast_info.get("homepage_url"),
+        "image": podcast_info.get("image_url"),
+        "language": podcast_info.get("language"),
+    })
+
+def encode(document: Dict, fmt: str) -> bytes:
+    if fmt == "msgpack":
+        return msgpack.packb(document, use_bin_type=True)
+    return json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def indexed_days(bucket) -> List:
+    days = []
+    for blob in bucket.list_blobs(prefix=f"{INDEX_PREFIX}/days/"):
+        try:
+            days.append(date.fromisoformat(blob.name.rsplit("/", 1)[-1].removesuffix(".json")))
+        except ValueError:
+            continue  # Other formats of the same day
+    return sorted(days)
+
+def _publish(bucket, name_for, document_for, cache_control) -> bool:
+    """Write the document in every format; generated is excluded from the hash."""
+    uploaded = False
+    for fmt in INDEX_FORMATS:
+        document = document_for(fmt)
+        stable = {key: value for key, value in document.items() if key != "generated"}
+        uploaded |= cdn.publish(bucket, name_for(fmt), encode(document, fmt), CONTENT_TYPES[fmt],
+                                cache_control, hash_data=encode(stable, fmt))
+    return uploaded
+
+def publish_shard(bucket, podcast_info, day, episodes: List[Dict], prev_day, base_url: str) -> bool:
+    """Document for one completed UTC day, linked to the previous shard."""
+    def document(fmt):
+        return compact({
+            "version": INDEX_VERSION,
+            "generated": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "podcast": podcast_summary(podcast_info),
+            "date": day.isoformat(),
+            "prev": f"{base_url}/{shard_name(prev_day, fmt)}" if prev_day else None,
+            "head": f"{base_url}/{head_name(fmt)}",
+            "episodes": episodes,
+        })
+    return _publish(bucket, lambda fmt: shard_name(day, fmt), document, SHARD_CACHE_CONTROL)
+
+def publish_head(bucket, podcast_info, episodes: List[Dict], base_url: str) -> bool:
+    """The head index: the feed's episodes plus the dates of the latest shards."""
+    days = indexed_days(bucket)[-INDEX_HEAD_DAYS:]
+
+    def document(fmt):
+        return {
+            "version": INDEX_VERSION,
+            "generated": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "podcast": podcast_summary(podcast_info),
+            "days": [day.isoformat() for day in reversed(days)],  # Most recent first
+            "day_url": f"{base_url}/{INDEX_PREFIX}/days/{{date}}.{fmt}",
+            "episodes": episodes,
+        }
+    return _publish(bucket, head_name, document, INDEX_CACHE_CONTROL)
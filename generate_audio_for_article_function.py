@@ -4,12 +4,19 @@ import json
 import random
 import base64
 from io import BytesIO
+from functools import lru_cache
 from supabase import create_client, Client
 from google.cloud import storage, pubsub_v1
+from google.cloud import texttospeech_v1beta1 as texttospeech
 from elevenlabs import VoiceSettings
 from elevenlabs.client import ElevenLabs
 from pydub import AudioSegment
 
+from text_prep import prepare_tts_text
+import hls
+from profiling import profiled
+from resilience import Backend, failover
+
 # Initialize Supabase and ElevenLabs clients
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
 SUPABASE_URL = os.getenv("SUPABASE_URL")
@@ -20,7 +27,18 @@ supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 client = ElevenLabs(api_key=ELEVENLABS_API_KEY)
 audio_ids = ("lVCldLIMCFckDUbGfwtx", "lVCldLIMCFckDUbGfwtx")
 
-def text_to_speech_stream(text: str) -> BytesIO:
+# Gemini TTS is the fallback while ElevenLabs' circuit is open
+GEMINI_TTS_MODEL_ID = "gemini-2.5-flash-tts"
+GEMINI_TTS_VOICE = "Fenrir"
+
+# ElevenLabs' mp3_22050_32; fallback renders are re-encoded to match so the HLS stream has one format
+OUTPUT_SAMPLE_RATE = 22050
+OUTPUT_BITRATE = "32k"
+
+elevenlabs_backend = Backend("elevenlabs")
+gemini_backend = Backend("gemini_tts")
+
+def _elevenlabs_audio(text: str) -> bytes:
     # Perform the text-to-speech conversion with ElevenLabs
     response = client.text_to_speech.convert(
         voice_id=random.choice(audio_ids),  # Replace with actual voice ID
@@ -34,19 +52,47 @@ def text_to_speech_stream(text: str) -> BytesIO:
             use_speaker_boost=True,
         ),
     )
+    # Consume the stream inside the call so hedging and the breaker see the whole request
+    return b"".join(chunk for chunk in response if chunk)
+
+@lru_cache(maxsize=None)
+def _gemini_client() -> texttospeech.TextToSpeechClient:
+    return texttospeech.TextToSpeechClient()
+
+def _gemini_audio(text: str) -> bytes:
+    response = _gemini_client().synthesize_speech(
+        input=texttospeech.SynthesisInput(text=text),
+        voice=texttospeech.VoiceSelectionParams(
+            language_code="hu-HU", name=GEMINI_TTS_VOICE, model_name=GEMINI_TTS_MODEL_ID
+        ),
+        audio_config=texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding.MP3),
+    )
+    return response.audio_content
 
-    # Create a BytesIO object to hold the audio data in memory
-    audio_stream = BytesIO()
+def _resample(audio: bytes) -> bytes:
+    """Re-encode an MP3 at ElevenLabs' output rate, bitrate and channel count."""
+    segment = AudioSegment.from_file(BytesIO(audio), format="mp3")
+    out = BytesIO()
+    segment.set_frame_rate(OUTPUT_SAMPLE_RATE).set_channels(1).export(out, format="mp3", bitrate=OUTPUT_BITRATE)
+    return out.getvalue()
 
-    # Write each chunk of audio data to the stream
-    for chunk in response:
-        if chunk:
-            audio_stream.write(chunk)
+def text_to_speech_stream(text: str) -> BytesIO:
+    """ElevenLabs with hedged requests, failing over to Gemini TTS while its circuit is open."""
+    backend, audio = failover([
+        (elevenlabs_backend, lambda: _elevenlabs_audio(text)),
+        (gemini_backend, lambda: _gemini_audio(text)),
+    ])
+    logging.info(f"TTS backend: {backend}; " + json.dumps(
+        {b.name: b.metrics() for b in (elevenlabs_backend, gemini_backend)}))
+    if backend != elevenlabs_backend.name:
+        audio = _resample(audio)  # Gemini renders at 24 kHz
 
-    # Reset stream position to the beginning
+    # Create a BytesIO object to hold the audio data in memory
+    audio_stream = BytesIO(audio)
     audio_stream.seek(0)
     return audio_stream
 
+@profiled
 def generate_audio_for_article(event, context):
     publisher = pubsub_v1.PublisherClient()
     topic_path = publisher.topic_path("currentlyai", "audio-generated")
@@ -64,8 +110,10 @@ def generate_audio_for_article(event, context):
 
     # Generate audio content
     try:
-        text_content = f"{article_data['title']}. {article_data['full_text']}"
-        audio_stream = text_to_speech_stream(text_content)  # Audio generation logic
+        # Title is read once even when the body repeats it; markdown and repeats are dropped
+        prepared = prepare_tts_text(article_data['full_text'], title=article_data['title'])
+        logging.info(f"Saved {prepared.saved_chars} TTS characters for article ID {article_id}")
+        audio_stream = text_to_speech_stream(prepared.text)  # Audio generation logic
 
         # Upload audio to GCS
         storage_client = storage.Client()
@@ -75,6 +123,10 @@ def generate_audio_for_article(event, context):
         blob.upload_from_file(audio_stream, content_type="audio/mpeg")
         audio_url = f"https://storage.googleapis.com/{bucket.name}/{filename}"
 
+        # The RSS enclosure still needs the full file; HLS segments are published alongside it
+        if hls.writes_hls():
+            hls.append_audio(bucket, "articles", audio_stream.getvalue(), article_data['title'])
+
         # Calculate duration and size
         blob.reload()
         file_length_bytes = blob.size
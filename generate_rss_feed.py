@@ -1,18 +1,53 @@
+"""
+RSS feed publishing. The head feed is stored gzip-encoded with a content hash
+(excluding lastBuildDate), so an unchanged rebuild isn't re-uploaded and
+clients keep getting 304s. Completed UTC days go to RFC 5005 archive documents
+linked through atom:link rel="prev-archive"; days without episodes get an empty
+archive, and recent days are re-rendered so late audio still gets its enclosure.
+"""
 from supabase import create_client, Client
 import xml.etree.ElementTree as ET
 from google.cloud import  storage
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timedelta, timezone, date, time
 import json
 import logging
 import os
+import re
 import base64
 from xml.dom import minidom
 
+import cdn
+import episode_index
+from profiling import profiled
+
 # Initialize Supabase client
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+BUCKET_NAME = "news_audio_bucket"
+FEED_BLOB = "audio/rss/rss_feed.xml"
+ARCHIVE_PREFIX = "audio/rss/archive"  # One RFC 5005 archive document per UTC day
+FEED_BASE_URL = os.getenv("FEED_BASE_URL", f"https://storage.googleapis.com/{BUCKET_NAME}")
+FEED_URL = f"{FEED_BASE_URL}/{FEED_BLOB}"
+FEED_CONTENT_TYPE = "application/rss+xml; charset=utf-8"
+
+# Clients poll the head feed; archives only change when late audio arrives
+FEED_CACHE_CONTROL = os.getenv("FEED_CACHE_CONTROL", "public, max-age=300")
+ARCHIVE_CACHE_CONTROL = "public, max-age=86400"
+FEED_ARCHIVE_DAYS = int(os.getenv("FEED_ARCHIVE_DAYS", "30"))  # How far back missing archives are built
+FEED_ARCHIVE_REFRESH_DAYS = int(os.getenv("FEED_ARCHIVE_REFRESH_DAYS", "7"))  # Recent archives rebuilt if changed
+
+ITUNES_NS = "http://www.itunes.com/dtds/podcast-1.0.dtd"
+ATOM_NS = "http://www.w3.org/2005/Atom"
+FH_NS = "http://purl.org/syndication/history/1.0"
+ET.register_namespace("itunes", ITUNES_NS)
+ET.register_namespace("atom", ATOM_NS)
+ET.register_namespace("fh", FH_NS)
+
+# Excluded from the content hash so an unchanged feed isn't re-uploaded just for a new build time
+LAST_BUILD_DATE = re.compile(rb"<lastBuildDate>.*?</lastBuildDate>")
+
 def fetch_podcast_info(podcast_id):
     response = supabase.table("podcast").select("*").eq("id", podcast_id).single().execute()
     if response.data:
@@ -21,21 +56,24 @@ def fetch_podcast_info(podcast_id):
         print("Error fetching podcast data:", response)
         return None
 
-def fetch_recent_episodes_with_audio():
-    # Calculate timestamp for 24 hours ago using timezone-aware datetime
-    twenty_four_hours_ago = datetime.now(timezone.utc) - timedelta(hours=24)
-    timestamp = twenty_four_hours_ago.isoformat()
-
-    response = (
+def fetch_episodes_with_audio(since, until=None):
+    query = (
         supabase.table("article")
         .select("*, audio_file(audio_url, length, duration)")
-        .gte("pub_date", timestamp)  # Filter for articles newer than 24 hours
-        .order("pub_date", desc=True)  # Most recent first
-        .execute()
+        .gte("pub_date", since.isoformat())
     )
+    if until is not None:
+        query = query.lt("pub_date", until.isoformat())
+    response = query.order("pub_date", desc=True).execute()  # Most recent first
+    return response.data or []
+
+def fetch_recent_episodes_with_audio():
+    # Calculate timestamp for 24 hours ago using timezone-aware datetime
+    twenty_four_hours_ago = datetime.now(timezone.utc) - timedelta(hours=24)
+    response = fetch_episodes_with_audio(twenty_four_hours_ago)
     
-    if response.data:
-        return response.data
+    if response:
+        return response
     else:
         print("Error fetching articles and audio files:", response)
         return []
@@ -51,32 +89,62 @@ def format_datetime_rfc822(dt):
     """Convert datetime to RFC 822 format required by RSS"""
     return dt.strftime('%a, %d %b %Y %H:%M:%S %z')
 
-def generate_rss_feed(event, context):
-    # Decode the Pub/Sub message
-    decoded_data = base64.b64decode(event['data']).decode("utf-8")
-    message_data = json.loads(decoded_data)
-    
-    # Fetch podcast and episode data from Supabase
-    podcast_info = fetch_podcast_info('76f55288-cd16-4b2c-892a-89e1aeac5b27')
-    if not podcast_info:
-        logging.error("Missing podcast data; RSS feed generation aborted.")
-        return
+def episode_datetime(episode):
+    """pub_date as a timezone-aware datetime, or None if missing or malformed."""
+    pub_date = episode.get("pub_date")
+    if not pub_date:
+        return None
+    try:
+        # Parse ISO format string to timezone-aware datetime
+        return datetime.fromisoformat(pub_date.replace("Z", "+00:00"))
+    except (ValueError, AttributeError):
+        return None
 
-    # Fetch only recent episodes
-    episodes = fetch_recent_episodes_with_audio()
-    if not episodes:
-        logging.info("No recent episodes found; RSS feed generation aborted.")
-        return
+def add_episode_item(channel, episode):
+    """Render one <item>; returns the same episode as a compact record for the JSON index."""
+    record = {"id": episode.get("id"), "title": episode["title"], "description": episode.get("description", "")}
+    item = create_xml_element(channel, "item")
+    create_xml_element(item, "title", episode["title"])
+    create_xml_element(item, "description", episode.get("description", ""))
 
-    logging.info(f"Found {len(episodes)} episodes from the last 24 hours")
+    # Enclosure with URL, type, and length from audio_file
+    if "audio_file" in episode and episode["audio_file"]:
+        audio_url = episode["audio_file"][0]["audio_url"]
+        audio_length = episode["audio_file"][0]["length"]
+        create_xml_element(item, "enclosure", attrib={
+            "url": audio_url,
+            "type": "audio/mpeg",
+            "length": str(audio_length)
+        })
+
+        # GUID and publication date
+        create_xml_element(item, "guid", audio_url, {"isPermaLink": "false"})
+        
+        # Use pub_date for pubDate if available, otherwise current time
+        pub_datetime = episode_datetime(episode) or datetime.now(timezone.utc)
+        create_xml_element(item, "pubDate", format_datetime_rfc822(pub_datetime))
+        record.update(audio_url=audio_url, length=audio_length, pub_date=pub_datetime.isoformat())
+
+        # Duration
+        if "duration" in episode["audio_file"][0]:
+            create_xml_element(item, f"{{{ITUNES_NS}}}duration",
+                            str(round(episode["audio_file"][0]["duration"], 2)))
+            record["duration"] = round(episode["audio_file"][0]["duration"], 2)
+    
+    # Explicit flag for episode
+    create_xml_element(item, f"{{{ITUNES_NS}}}explicit",
+                     "yes" if episode.get("explicit", False) else "no")
+    record["explicit"] = bool(episode.get("explicit", False))
+    return episode_index.compact(record)
 
+def render_feed(podcast_info, episodes, links, archive=False, records=None):
+    """
+    Render an RSS document as UTF-8 bytes. links maps RFC 5005 link relations
+    (self, current, prev-archive) to URLs; archive marks an archive document.
+    If records is a list, the episodes' index records are appended to it.
+    """
     # Create XML document with proper encoding declaration
     rss = ET.Element("rss", version="2.0")
-    
-    # Register namespaces explicitly
-    ET.register_namespace("itunes", "http://www.itunes.com/dtds/podcast-1.0.dtd")
-    ET.register_namespace("atom", "http://www.w3.org/2005/Atom")
-    
     channel = ET.SubElement(rss, "channel")
     
     # Podcast-level tags with proper encoding
@@ -87,6 +155,14 @@ def generate_rss_feed(event, context):
     # Add last build date using timezone-aware datetime
     current_time = datetime.now(timezone.utc)
     create_xml_element(channel, "lastBuildDate", format_datetime_rfc822(current_time))
+
+    # Feed paging (RFC 5005 archived feeds)
+    for rel, href in links.items():
+        create_xml_element(channel, f"{{{ATOM_NS}}}link", attrib={
+            "rel": rel, "href": href, "type": "application/rss+xml"
+        })
+    if archive:
+        create_xml_element(channel, f"{{{FH_NS}}}archive")
     
     # Podcast image
     image = create_xml_element(channel, "image")
@@ -95,65 +171,28 @@ def generate_rss_feed(event, context):
     create_xml_element(image, "link", podcast_info["homepage_url"])
     
     # iTunes-specific tags
-    create_xml_element(channel, "{http://www.itunes.com/dtds/podcast-1.0.dtd}image", 
+    create_xml_element(channel, f"{{{ITUNES_NS}}}image", 
                       attrib={"href": podcast_info["image_url"]})
-    create_xml_element(channel, "{http://www.itunes.com/dtds/podcast-1.0.dtd}author", 
+    create_xml_element(channel, f"{{{ITUNES_NS}}}author", 
                       podcast_info["author"])
-    create_xml_element(channel, "{http://www.itunes.com/dtds/podcast-1.0.dtd}explicit", 
+    create_xml_element(channel, f"{{{ITUNES_NS}}}explicit", 
                       "yes" if podcast_info["explicit"] else "no")
     create_xml_element(channel, "language", podcast_info["language"])
     
-    owner = create_xml_element(channel, "{http://www.itunes.com/dtds/podcast-1.0.dtd}owner")
-    create_xml_element(owner, "{http://www.itunes.com/dtds/podcast-1.0.dtd}email", 
+    owner = create_xml_element(channel, f"{{{ITUNES_NS}}}owner")
+    create_xml_element(owner, f"{{{ITUNES_NS}}}email", 
                       podcast_info["owner_email"])
     
-    create_xml_element(channel, "{http://www.itunes.com/dtds/podcast-1.0.dtd}category", 
+    create_xml_element(channel, f"{{{ITUNES_NS}}}category", 
                       attrib={"text": podcast_info["category"]})
 
     # Episode-level tags
     for episode in episodes:
-        item = create_xml_element(channel, "item")
-        create_xml_element(item, "title", episode["title"])
-        create_xml_element(item, "description", episode.get("description", ""))
-
-        # Enclosure with URL, type, and length from audio_file
-        if "audio_file" in episode and episode["audio_file"]:
-            audio_url = episode["audio_file"][0]["audio_url"]
-            audio_length = episode["audio_file"][0]["length"]
-            create_xml_element(item, "enclosure", attrib={
-                "url": audio_url,
-                "type": "audio/mpeg",
-                "length": str(audio_length)
-            })
-
-            # GUID and publication date
-            create_xml_element(item, "guid", audio_url, {"isPermaLink": "false"})
-            
-            # Use pub_date for pubDate if available, otherwise current time
-            pub_date = episode.get("pub_date")
-            if pub_date:
-                try:
-                    # Parse ISO format string to timezone-aware datetime
-                    pub_datetime = datetime.fromisoformat(pub_date.replace("Z", "+00:00"))
-                    formatted_pub_date = format_datetime_rfc822(pub_datetime)
-                except (ValueError, AttributeError):
-                    formatted_pub_date = format_datetime_rfc822(datetime.now(timezone.utc))
-            else:
-                formatted_pub_date = format_datetime_rfc822(datetime.now(timezone.utc))
-            
-            create_xml_element(item, "pubDate", formatted_pub_date)
-
-            # Duration
-            if "duration" in episode["audio_file"][0]:
-                create_xml_element(item, "{http://www.itunes.com/dtds/podcast-1.0.dtd}duration",
-                                str(round(episode["audio_file"][0]["duration"], 2)))
-        
-        # Explicit flag for episode
-        create_xml_element(item, "{http://www.itunes.com/dtds/podcast-1.0.dtd}explicit",
-                         "yes" if episode.get("explicit", False) else "no")
+        record = add_episode_item(channel, episode)
+        if records is not None:
+            records.append(record)
     
     # Convert to string with proper XML declaration and encoding
-    # xml_declaration = '<?xml version="1.0" encoding="UTF-8"?>\n'
     rough_string = ET.tostring(rss, encoding='utf-8', method='xml')  # Generate as bytes with correct encoding
 
     # Reparse the string to create a pretty-printed XML
@@ -165,22 +204,121 @@ def generate_rss_feed(event, context):
     # Ensure the final output has a single declaration
     xml_declaration = '<?xml version="1.0" encoding="UTF-8"?>\n'
     final_xml = xml_declaration + pretty_xml.split('\n', 1)[1]  # Avoids duplicates from `minidom`
+    return final_xml.encode("utf-8")
+
+def archive_blob_name(day):
+    return f"{ARCHIVE_PREFIX}/{day.isoformat()}.xml"
+
+def archived_days(bucket):
+    days = []
+    for blob in bucket.list_blobs(prefix=f"{ARCHIVE_PREFIX}/"):
+        try:
+            days.append(date.fromisoformat(blob.name.rsplit("/", 1)[-1].removesuffix(".xml")))
+        except ValueError:
+            continue
+    return sorted(days)
+
+def publish_archives(bucket, podcast_info, now):
+    """
+    Write archive documents for completed UTC days after the latest existing
+    archive (at most FEED_ARCHIVE_DAYS back) and re-render the last
+    FEED_ARCHIVE_REFRESH_DAYS, with a single query. Each archive links to its
+    predecessor and the current feed; one whose content hash hasn't changed is
+    not re-uploaded, so only days that gained episodes or audio are rewritten.
+    Days without episodes get an empty archive, so they aren't queried again.
+    Returns the latest archived day, or None.
+    """
+    days = archived_days(bucket)
+    today = now.date()
+    first = today - timedelta(days=FEED_ARCHIVE_DAYS)
+    if days:
+        first = max(first, min(days[-1] + timedelta(days=1), today - timedelta(days=FEED_ARCHIVE_REFRESH_DAYS)))
+    if first >= today:
+        return days[-1] if days else None
+
+    start_of = lambda day: datetime.combine(day, time.min, tzinfo=timezone.utc)
+    by_day = {first + timedelta(days=n): [] for n in range((today - first).days)}
+    for episode in fetch_episodes_with_audio(start_of(first), start_of(today)):
+        published = episode_datetime(episode)
+        if published:
+            by_day.setdefault(published.astimezone(timezone.utc).date(), []).append(episode)
+
+    # Each day's JSON index shard is written from the same render as its archive
+    days = sorted(set(days) | set(by_day))
+    shard_days = episode_index.indexed_days(bucket)
+    for day in sorted(by_day):
+        links = {"current": FEED_URL}
+        prev = [d for d in days if d < day]
+        if prev:
+            links["prev-archive"] = f"{FEED_BASE_URL}/{archive_blob_name(prev[-1])}"
+        records = []
+        data = render_feed(podcast_info, by_day[day], links, archive=True, records=records)
+        if cdn.publish(bucket, archive_blob_name(day), data, FEED_CONTENT_TYPE, ARCHIVE_CACHE_CONTROL,
+                       hash_data=LAST_BUILD_DATE.sub(b"", data)):
+            logging.info(f"Archived {len(by_day[day])} episodes for {day}.")
+        if not records:
+            continue  # Clients don't need shards for empty days
+        try:
+            prev_shard = [d for d in shard_days if d < day]
+            episode_index.publish_shard(bucket, podcast_info, day, records,
+                                        prev_shard[-1] if prev_shard else None, FEED_BASE_URL)
+            if day not in shard_days:
+                shard_days = sorted(shard_days + [day])
+        except Exception as e:
+            logging.error(f"Error publishing episode index shard for {day}: {e}")
+    return days[-1] if days else None
+
+@profiled
+def generate_rss_feed(event, context):
+    # Decode the Pub/Sub message
+    decoded_data = base64.b64decode(event['data']).decode("utf-8")
+    message_data = json.loads(decoded_data)
+    
+    # Fetch podcast and episode data from Supabase
+    podcast_info = fetch_podcast_info('76f55288-cd16-4b2c-892a-89e1aeac5b27')
+    if not podcast_info:
+        logging.error("Missing podcast data; RSS feed generation aborted.")
+        return
+
+    # Fetch only recent episodes
+    episodes = fetch_recent_episodes_with_audio()
+    if not episodes:
+        logging.info("No recent episodes found; RSS feed generation aborted.")
+        return
 
-    # Write the pretty-printed XML to file with UTF-8 encoding
-    local_file_path = "/tmp/podcast_feed.xml"
-    with open(local_file_path, "w", encoding="utf-8") as f:
-        f.write(final_xml)
-    logging.info("RSS feed generated locally.")
+    logging.info(f"Found {len(episodes)} episodes from the last 24 hours")
 
-    # Upload the XML file to Google Cloud Storage with proper content type and encoding
     try:
         storage_client = storage.Client()
-        bucket = storage_client.bucket("news_audio_bucket")
-        blob = bucket.blob("audio/rss/rss_feed.xml")
-        blob.upload_from_filename(
-            local_file_path,
-            content_type="application/rss+xml; charset=utf-8"
-        )
-        logging.info("RSS feed uploaded to Google Cloud Storage.")
+        bucket = storage_client.bucket(BUCKET_NAME)
+    except Exception as e:
+        logging.error(f"Error connecting to Google Cloud Storage: {e}")
+        return
+
+    # Older episodes move to daily archives so the polled head document stays small
+    links = {"self": FEED_URL}
+    try:
+        latest_archive = publish_archives(bucket, podcast_info, datetime.now(timezone.utc))
+        if latest_archive:
+            links["prev-archive"] = f"{FEED_BASE_URL}/{archive_blob_name(latest_archive)}"
+    except Exception as e:
+        logging.error(f"Error publishing RSS archives: {e}")
+
+    records = []
+    final_xml = render_feed(podcast_info, episodes, links, records=records)
+    logging.info("RSS feed generated.")
+
+    # Upload gzip-encoded with cache headers; skipped when only lastBuildDate changed
+    try:
+        if cdn.publish(bucket, FEED_BLOB, final_xml, FEED_CONTENT_TYPE, FEED_CACHE_CONTROL,
+                       hash_data=LAST_BUILD_DATE.sub(b"", final_xml)):
+            logging.info("RSS feed uploaded to Google Cloud Storage.")
+    except Exception as e:
+        logging.error(f"Error uploading RSS feed to Google Cloud Storage: {e}")
+
+    # Static JSON index of the same episodes, for clients that can't use the XML feed
+    try:
+        if episode_index.publish_head(bucket, podcast_info, records, FEED_BASE_URL):
+            logging.info("Episode index uploaded to Google Cloud Storage.")
     except Exception as e:
-        logging.error(f"Error uploading RSS feed to Google Cloud Storage: {e}")
\ No newline at end of file
+        logging.error(f"Error publishing episode index: {e}")
@@ -0,0 +1,211 @@
+"""
+Segmented (HLS) output: cuts encoded MP3 audio into fixed-duration packed-audio
+segments at frame boundaries and maintains a rolling live media playlist in GCS.
+Publishing an item only uploads its new segments and a small playlist.
+main.py publishes to the "news" stream; generate_audio_for_article publishes
+to "articles" and always keeps the MP3 file for the RSS enclosure.
+"""
+import os
+import json
+import math
+import time
+import uuid
+import struct
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import mp3_frames
+
+logger = logging.getLogger(__name__)
+
+# "file" (one MP3 per item), "hls" (segments only) or "both"
+AUDIO_OUTPUT_MODE = os.getenv("AUDIO_OUTPUT_MODE", "file")
+HLS_PREFIX = os.getenv("HLS_PREFIX", "hls")
+HLS_SEGMENT_SECONDS = float(os.getenv("HLS_SEGMENT_SECONDS", "6"))
+HLS_WINDOW_SEGMENTS = int(os.getenv("HLS_WINDOW_SEGMENTS", "600"))  # ~1 hour at 6s
+HLS_COMMIT_RETRIES = 5
+
+PLAYLIST_CACHE_CONTROL = "no-cache, max-age=0"
+SEGMENT_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# ID3 PRIV owner carrying the 33-bit MPEG-2 timestamp of the segment's first sample
+TIMESTAMP_OWNER = b"com.apple.streaming.transportStreamTimestamp\x00"
+
+_stream_locks = {}
+_stream_locks_lock = threading.Lock()
+
+def _stream_lock(stream: str) -> threading.Lock:
+    with _stream_locks_lock:
+        return _stream_locks.setdefault(stream, threading.Lock())
+
+def writes_file() -> bool:
+    return AUDIO_OUTPUT_MODE in ("file", "both")
+
+def writes_hls() -> bool:
+    return AUDIO_OUTPUT_MODE in ("hls", "both")
+
+def _syncsafe(value: int) -> bytes:
+    return bytes(((value >> 21) & 0x7F, (value >> 14) & 0x7F, (value >> 7) & 0x7F, value & 0x7F))
+
+def timestamp_tag(seconds: float) -> bytes:
+    """ID3v2.4 tag with the PRIV timestamp that packed-audio HLS segments start with."""
+    ticks = int(round(seconds * 90000)) & ((1 << 33) - 1)
+    payload = TIMESTAMP_OWNER + struct.pack(">Q", ticks)
+    frame = b"PRIV" + _syncsafe(len(payload)) + b"\x00\x00" + payload
+    return b"ID3\x04\x00\x00" + _syncsafe(len(frame)) + frame
+
+def split_segments(data: bytes, segment_seconds: float = HLS_SEGMENT_SECONDS) -> List[tuple]:
+    """Cut MP3 bytes into (frames, duration) groups of about segment_seconds, at frame boundaries."""
+    header = mp3_frames.first_header(data)
+    if header is None:
+        return []
+    frames = mp3_frames.audio_frames(data)
+    per_segment = max(1, round(segment_seconds / header.duration))
+    return [
+        (frames[i:i + per_segment], len(frames[i:i + per_segment]) * header.duration)
+        for i in range(0, len(frames), per_segment)
+    ]
+
+def _format_key(data: bytes) -> Optional[str]:
+    header = mp3_frames.first_header(data)
+    return f"{header.version_bits}:{header.sample_rate}:{header.channel_mode}" if header else None
+
+def render_playlist(state: dict) -> str:
+    target = max([math.ceil(s["duration"]) for s in state["segments"]] + [math.ceil(HLS_SEGMENT_SECONDS)])
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        f"#EXT-X-TARGETDURATION:{target}",
+        f"#EXT-X-MEDIA-SEQUENCE:{state['media_sequence']}",
+        f"#EXT-X-DISCONTINUITY-SEQUENCE:{state['discontinuity_sequence']}",
+    ]
+    for segment in state["segments"]:
+        if segment.get("discontinuity"):
+            lines.append("#EXT-X-DISCONTINUITY")
+        if segment.get("program_date_time"):
+            lines.append(f"#EXT-X-PROGRAM-DATE-TIME:{segment['program_date_time']}")
+        lines.append(f"#EXTINF:{segment['duration']:.3f},{segment.get('title', '')}")
+        lines.append(segment["uri"])
+    return "\n".join(lines) + "\n"
+
+def _empty_state() -> dict:
+    return {"media_sequence": 0, "discontinuity_sequence": 0, "elapsed": 0.0, "format": None,
+            "segments": [], "expired": []}
+
+def _load_state(blob):
+    if not blob.exists():
+        return _empty_state(), 0
+    blob.reload()
+    return json.loads(blob.download_as_bytes()), blob.generation or 0
+
+def _is_precondition_failure(error: Exception) -> bool:
+    return type(error).__name__ == "PreconditionFailed" or "412" in str(error)
+
+def _publish_playlist(bucket, prefix: str, state: dict, generation: int) -> bool:
+    """
+    Write the playlist rendered from the state committed as `generation`, unless
+    the playlist already reflects that generation or a newer one.
+    """
+    playlist = bucket.blob(f"{prefix}/playlist.m3u8")
+    for _ in range(HLS_COMMIT_RETRIES):
+        current = 0
+        if playlist.exists():
+            playlist.reload()
+            current = playlist.generation or 0
+            if int((playlist.metadata or {}).get("state_generation", 0)) >= generation:
+                return False  # A later commit already published its playlist
+        playlist.cache_control = PLAYLIST_CACHE_CONTROL
+        playlist.metadata = {"state_generation": str(generation)}
+        try:
+            playlist.upload_from_string(render_playlist(state), content_type="application/vnd.apple.mpegurl",
+                                        if_generation_match=current)
+            return True
+        except Exception as e:
+            if not _is_precondition_failure(e):
+                raise
+            time.sleep(0.1)
+    logger.warning(f"HLS: could not publish playlist for state generation {generation} of {prefix}.")
+    return False
+
+def append_audio(bucket, stream: str, data: bytes, title: str = "") -> int:
+    """
+    Append an encoded MP3 to a stream's live playlist. Segments are uploaded
+    once under unique names; the playlist state is then committed with a
+    generation precondition so concurrent writers never lose each other's items.
+    Returns the number of segments added.
+    """
+    groups = split_segments(data)
+    if not groups:
+        logger.warning(f"HLS: no MP3 frames for '{title}', nothing appended.")
+        return 0
+
+    # Items of one stream publish concurrently in this process; the generation
+    # precondition still covers other instances
+    with _stream_lock(stream):
+        prefix = f"{HLS_PREFIX}/{stream}"
+        item_key = uuid.uuid4().hex[:12]
+        state_blob = bucket.blob(f"{prefix}/state.json")
+        state, generation = _load_state(state_blob)
+
+        # Segment timestamps continue from the stream's running clock as of now
+        start = state["elapsed"]
+        elapsed = start
+        uploaded = []
+        for n, (frames, duration) in enumerate(groups):
+            uri = f"seg_{item_key}_{n:04d}.mp3"
+            blob = bucket.blob(f"{prefix}/{uri}")
+            blob.cache_control = SEGMENT_CACHE_CONTROL
+            blob.upload_from_string(timestamp_tag(elapsed) + b"".join(frames), content_type="audio/mpeg")
+            uploaded.append({"uri": uri, "duration": round(duration, 3)})
+            elapsed += duration
+
+        format_key = _format_key(data)
+        for attempt in range(HLS_COMMIT_RETRIES):
+            if attempt:
+                state, generation = _load_state(state_blob)
+            new_segments = [dict(segment) for segment in uploaded]
+            first = new_segments[0]
+            first["title"] = title.replace(",", " ").replace("\n", " ")
+            first["program_date_time"] = datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+            # Another writer got in first: our timestamps restart, which players need flagged
+            if state["format"] not in (None, format_key) or abs(state["elapsed"] - start) > 1e-6:
+                first["discontinuity"] = True
+            state["format"] = format_key
+
+            state["segments"].extend(new_segments)
+            state["elapsed"] = elapsed
+            overflow = len(state["segments"]) - HLS_WINDOW_SEGMENTS
+            if overflow > 0:
+                dropped = state["segments"][:overflow]
+                state["segments"] = state["segments"][overflow:]
+                state["media_sequence"] += overflow
+                state["discontinuity_sequence"] += len([s for s in dropped if s.get("discontinuity")])
+                state["expired"].extend(s["uri"] for s in dropped)
+            # Keep recently expired segments for players still holding the old playlist
+            keep = max(1, HLS_WINDOW_SEGMENTS // 10)
+            stale = state["expired"][:-keep] if len(state["expired"]) > keep else []
+            state["expired"] = state["expired"][len(stale):]
+
+            try:
+                state_blob.upload_from_string(json.dumps(state), content_type="application/json",
+                                              if_generation_match=generation)
+                break
+            except Exception as e:
+                if not _is_precondition_failure(e):
+                    raise
+                logger.info(f"HLS: concurrent playlist update on {stream}, retrying.")
+                time.sleep(0.1)
+        else:
+            raise RuntimeError(f"HLS: could not commit playlist state for {stream}.")
+
+        _publish_playlist(bucket, prefix, state, state_blob.generation or generation + 1)
+
+        for uri in stale:
+            try:
+                bucket.blob(f"{prefix}/{uri}").delete()
+            except Exception as e:
+                logger.warning(f"HLS: could not delete expired segment {uri}: {e}")
+        logger.info(f"HLS: appended {len(new_segments)} segments to {stream} ({len(stale)} expired deleted).")
+        return len(new_segments)
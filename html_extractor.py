@@ -0,0 +1,539 @@
+"""
+Single-pass HTML text extraction built on the standard library HTMLParser.
+Skips boilerplate subtrees without building a DOM, and scores content
+blocks readability-style to find the article body and title.
+"""
+import os
+import re
+import sys
+import time
+import logging
+from typing import NamedTuple
+from html.parser import HTMLParser
+
+# Optional C parser backend for the article scorer; falls back to html.parser
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+# Refuse pages larger than this before doing any parsing work
+MAX_HTML_BYTES = int(os.getenv("MAX_HTML_BYTES", str(10 * 1024 * 1024)))
+
+# Subtrees whose text never makes it into the extracted content
+SKIP_TAGS = frozenset(["script", "style", "header", "footer", "nav", "aside"])
+
+# BeautifulSoup's get_text() also leaves out strings inside these
+HIDDEN_TEXT_TAGS = frozenset(["template", "rt", "rp"])
+
+# Elements that never have content or an end tag (BeautifulSoup's list)
+VOID_TAGS = frozenset([
+    "area", "base", "basefont", "bgsound", "br", "col", "command", "embed", "frame", "hr", "image", "img",
+    "input", "isindex", "keygen", "link", "menuitem", "meta", "nextid", "param", "source", "spacer",
+    "track", "wbr",
+])
+
+# Fed to the parser in slices so a huge page is never copied around in one go
+FEED_CHUNK_SIZE = 64 * 1024
+
+class OpenElements:
+    """
+    Stack of open elements with BeautifulSoup's html.parser rules: an end tag
+    closes the nearest open element of that name along with everything opened
+    inside it, and an end tag with no open element is ignored. Tracks how many
+    open elements belong to a given set, so an unclosed <nav> ends with its parent.
+    """
+
+    def __init__(self, tracked):
+        self.tracked = tracked
+        self.tags = []
+        self.counts = {}
+        self.depth = 0  # Open elements that are in tracked
+
+    def push(self, tag):
+        self.tags.append(tag)
+        self.counts[tag] = self.counts.get(tag, 0) + 1
+        if tag in self.tracked:
+            self.depth += 1
+
+    def pop_to(self, tag) -> list:
+        """Close tag and everything opened after it; returns the closed tags, innermost first."""
+        if not self.counts.get(tag):
+            return []
+        closed = []
+        while True:
+            current = self.tags.pop()
+            self.counts[current] -= 1
+            if current in self.tracked:
+                self.depth -= 1
+            closed.append(current)
+            if current == tag:
+                return closed
+
+class StreamingTextExtractor(HTMLParser):
+    """
+    Collects visible text, dropping everything inside SKIP_TAGS, with the same
+    output as BeautifulSoup's html.parser get_text(). Malformed character
+    references (no semicolon, e.g. "&lt-x") are decoded per HTML5 here, where
+    bs4 keeps them literal.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.pending = []
+        self.open = OpenElements(SKIP_TAGS | HIDDEN_TEXT_TAGS)
+
+    def flush(self):
+        # A text node can arrive in several handle_data calls when it straddles
+        # a feed() boundary, so only emit it once the next markup event shows up
+        if self.pending:
+            text = "".join(self.pending).strip()
+            self.pending = []
+            if text:
+                self.parts.append(text)
+
+    def handle_starttag(self, tag, attrs):
+        self.flush()
+        if tag not in VOID_TAGS:
+            self.open.push(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        # Self-closing tags (<nav/>) open no subtree
+        self.flush()
+
+    def handle_endtag(self, tag):
+        self.flush()
+        self.open.pop_to(tag)
+
+    def handle_comment(self, data):
+        self.flush()
+
+    def handle_decl(self, decl):
+        self.flush()
+
+    def handle_pi(self, data):
+        self.flush()
+
+    def unknown_decl(self, data):
+        # <![CDATA[...]]> is a text node of its own, as in BeautifulSoup
+        self.flush()
+        if data.upper().startswith("CDATA["):
+            self.handle_data(data[len("CDATA["):])
+            self.flush()
+
+    def handle_data(self, data):
+        if not self.open.depth:
+            self.pending.append(data)
+
+    def close(self):
+        super().close()
+        self.flush()
+
+    def text(self, separator=" ") -> str:
+        return separator.join(self.parts)
+
+def check_input_size(html: str, max_bytes: int = MAX_HTML_BYTES):
+    """Raise ValueError if the page exceeds the configured size limit."""
+    # len() in characters is a cheap lower bound; only encode when it matters
+    if len(html) > max_bytes or (len(html) * 4 > max_bytes and len(html.encode("utf-8")) > max_bytes):
+        raise ValueError(f"HTML input exceeds the {max_bytes} byte limit.")
+
+def extract_text(html: str, max_bytes: int = MAX_HTML_BYTES) -> str:
+    """Extract visible text from HTML in one streaming pass."""
+    check_input_size(html, max_bytes)
+    parser = StreamingTextExtractor()
+    for start in range(0, len(html), FEED_CHUNK_SIZE):
+        parser.feed(html[start:start + FEED_CHUNK_SIZE])
+    parser.close()
+    return parser.text()
+
+# --- Main-content scoring ---
+
+# Never part of an article body
+BOILERPLATE_TAGS = SKIP_TAGS | frozenset([
+    "head", "form", "button", "noscript", "iframe", "svg", "select", "template", "dialog"
+])
+
+# Elements that start a new block of text
+BLOCK_TAGS = frozenset([
+    "article", "main", "section", "div", "p", "pre", "blockquote", "td", "li", "ul", "ol",
+    "dl", "dd", "dt", "table", "tr", "figure", "h1", "h2", "h3", "h4", "h5", "h6", "body"
+])
+
+# Blocks whose own text counts as a paragraph for scoring
+PARAGRAPH_TAGS = frozenset(["p", "pre", "blockquote", "td", "li", "dd", "div", "section", "article"])
+
+# Starting score for a block once it becomes a candidate
+TAG_BASE_SCORES = {
+    "article": 10, "main": 10, "div": 5, "section": 3, "pre": 3, "td": 3, "blockquote": 3,
+    "ul": -3, "ol": -3, "dl": -3, "li": -3, "dd": -3, "dt": -3, "table": -3, "tr": -3,
+    "h1": -5, "h2": -5, "h3": -5, "h4": -5, "h5": -5, "h6": -5,
+}
+
+POSITIVE_HINTS = re.compile(r"article|body|content|entry|main|post|story|text|cikk|szoveg", re.I)
+NEGATIVE_HINTS = re.compile(
+    r"ad-|advert|banner|breadcrumb|comment|consent|cookie|footer|menu|modal|nav|newsletter"
+    r"|popup|promo|related|share|sidebar|social|sponsor|subscribe|tags|widget", re.I
+)
+
+MIN_PARAGRAPH_CHARS = 25
+MAX_RUN_LINK_DENSITY = 0.5
+
+# Trailing " | Site name" / " - Site name" on <title>
+TITLE_SUFFIX = re.compile(r"\s+[|\-\u2013\u2014\u00bb]\s+[^|\-\u2013\u2014\u00bb]{1,40}$")
+
+class ExtractedArticle(NamedTuple):
+    title: str
+    text: str
+    visible_chars: int  # All text outside boilerplate tags
+
+    @property
+    def stripped_chars(self) -> int:
+        return self.visible_chars - len(self.text)
+
+class _Block:
+    __slots__ = ("id", "tag", "parent", "weight", "depth", "own_len", "link_len", "total_len",
+                 "total_link", "commas", "score", "scored", "children")
+
+    def __init__(self, block_id, tag, parent, weight, depth=0):
+        self.id = block_id
+        self.tag = tag
+        self.parent = parent
+        self.weight = weight
+        self.depth = depth  # Open elements when the block started; it closes when they drop below this
+        self.own_len = self.link_len = self.total_len = self.total_link = self.commas = 0
+        self.score = 0.0
+        self.scored = False
+        self.children = []
+
+def _class_weight(attrs) -> int:
+    hints = f"{attrs.get('class') or ''} {attrs.get('id') or ''}"
+    if not hints.strip():
+        return 0
+    weight = 0
+    if NEGATIVE_HINTS.search(hints):
+        weight -= 25
+    if POSITIVE_HINTS.search(hints):
+        weight += 25
+    return weight
+
+class ArticleExtractor:
+    """
+    Parser target that records text runs per block in one pass and scores
+    blocks by paragraph count, commas, text length and link density.
+    """
+
+    def __init__(self):
+        self.blocks = [_Block(0, "#root", None, 0)]
+        self.stack = [self.blocks[0]]
+        self.open = OpenElements(BOILERPLATE_TAGS)
+        self.runs = []  # (block id, text, link chars) in document order
+        self.pieces = []
+        self.piece_link_chars = 0
+        self.capture = None  # "title" or "h1" while collecting a title candidate
+        self.captured = {"title": [], "h1": []}
+        self.meta_title = None
+
+    # Parser target interface (shared by lxml and the HTMLParser adapter)
+
+    def start(self, tag, attrs):
+        if tag == "meta" and (attrs.get("property") or attrs.get("name")) == "og:title":
+            self.meta_title = self.meta_title or (attrs.get("content") or "").strip() or None
+        if tag == "title" and not self.captured["title"]:
+            self.capture = "title"
+        # The headline is often inside <header>, so it is captured before boilerplate is skipped
+        if tag == "h1" and not self.captured["h1"] and self.capture is None:
+            self.capture = "h1"
+        if tag in VOID_TAGS:
+            return
+        if self.open.depth or tag in BOILERPLATE_TAGS:
+            if not self.open.depth:
+                self.flush()
+            self.open.push(tag)
+            return
+        if tag in BLOCK_TAGS:
+            self.flush()
+            if tag == "p" and self.stack[-1].tag == "p":
+                # <p> can't nest; the open one ends here, with anything left open inside it
+                self.open.pop_to("p")
+                self.close_blocks()
+            parent = self.stack[-1]
+            block = _Block(len(self.blocks), tag, parent.id, _class_weight(attrs), len(self.open.tags))
+            self.blocks.append(block)
+            parent.children.append(block.id)
+            self.stack.append(block)
+        self.open.push(tag)
+
+    def end(self, tag):
+        if tag == "title" and self.capture == "title":
+            self.capture = None
+        closed = self.open.pop_to(tag)
+        if not closed:
+            # Stray end tag: ignored, but the text on either side stays separate words
+            self.pieces.append(" ")
+            return
+        if self.capture == "h1" and "h1" in closed:
+            self.capture = None
+        self.close_blocks()
+
+    def data(self, data):
+        if self.capture:
+            self.captured[self.capture].append(data)
+        if self.open.depth:
+            return
+        self.pieces.append(data)
+        if self.open.counts.get("a"):
+            self.piece_link_chars += len(data.strip())
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        self.flush()
+        while len(self.stack) > 1:
+            self.close_block()
+        return self.result()
+
+    # Block bookkeeping
+
+    def flush(self):
+        if not self.pieces:
+            return
+        text = " ".join("".join(self.pieces).split())
+        link_chars = min(self.piece_link_chars, len(text))
+        self.pieces = []
+        self.piece_link_chars = 0
+        if text:
+            block = self.stack[-1]
+            self.runs.append((block.id, text, link_chars))
+            block.own_len += len(text)
+            block.link_len += link_chars
+            block.commas += text.count(",")
+
+    def close_blocks(self):
+        """Close the blocks whose element is no longer open."""
+        if len(self.stack) > 1 and self.stack[-1].depth >= len(self.open.tags):
+            self.flush()
+            while len(self.stack) > 1 and self.stack[-1].depth >= len(self.open.tags):
+                self.close_block()
+
+    def close_block(self) -> str:
+        block = self.stack.pop()
+        block.total_len += block.own_len
+        block.total_link += block.link_len
+        parent = self.blocks[block.parent]
+        parent.total_len += block.total_len
+        parent.total_link += block.total_link
+
+        if block.tag in PARAGRAPH_TAGS and block.own_len >= MIN_PARAGRAPH_CHARS:
+            content_score = 1 + block.commas + min(block.own_len // 100, 3)
+            self.add_score(parent, content_score)
+            if parent.parent is not None:
+                self.add_score(self.blocks[parent.parent], content_score / 2)
+        return block.tag
+
+    def add_score(self, block, score):
+        if not block.scored:
+            block.score += TAG_BASE_SCORES.get(block.tag, 0) + block.weight
+            block.scored = True
+        block.score += score
+
+    # Selection
+
+    def final_score(self, block) -> float:
+        if not block.total_len:
+            return 0.0
+        return block.score * (1 - block.total_link / block.total_len)
+
+    def result(self) -> ExtractedArticle:
+        visible_chars = sum(len(text) for _, text, _ in self.runs)
+        scored = [b for b in self.blocks if b.scored]
+        if scored:
+            top = max(scored, key=self.final_score)
+            selected = self.select_siblings(top)
+            text = "\n\n".join(self.kept_runs(selected))
+        else:
+            text = "\n\n".join(t for _, t, _ in self.runs)
+        return ExtractedArticle(self.title(), text, visible_chars)
+
+    def select_siblings(self, top) -> set:
+        """Readability keeps siblings of the top candidate that score close to it."""
+        top_score = self.final_score(top)
+        threshold = max(10.0, top_score * 0.2)
+        if top.parent is None:
+            return {top.id}
+        selected = set()
+        for sibling_id in self.blocks[top.parent].children:
+            sibling = self.blocks[sibling_id]
+            link_density = sibling.total_link / sibling.total_len if sibling.total_len else 1.0
+            if (sibling is top or (sibling.scored and self.final_score(sibling) >= threshold)
+                    or (sibling.tag == "p" and sibling.own_len > 80 and link_density < 0.25)):
+                selected.add(sibling_id)
+        return selected
+
+    def kept_runs(self, selected):
+        # Blocks are numbered in document order, so parents are visited before children
+        included = {}
+        for block in self.blocks:
+            if block.id in selected:
+                included[block.id] = True
+            elif block.parent is not None and included.get(block.parent):
+                included[block.id] = block.weight >= 0
+        for block_id, text, link_chars in self.runs:
+            if included.get(block_id) and link_chars / len(text) <= MAX_RUN_LINK_DENSITY:
+                yield text
+
+    def title(self) -> str:
+        if self.meta_title:
+            return self.meta_title
+        h1 = " ".join("".join(self.captured["h1"]).split())
+        if h1:
+            return h1
+        title = " ".join("".join(self.captured["title"]).split())
+        return TITLE_SUFFIX.sub("", title)
+
+class _TargetAdapter(HTMLParser):
+    """Drives an lxml-style parser target from the standard library parser."""
+
+    def __init__(self, target):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag, dict(attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.target.start(tag, dict(attrs))
+        self.target.end(tag)
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+    def handle_comment(self, data):
+        self.target.comment(data)
+
+    def close(self):
+        super().close()
+        return self.target.close()
+
+def _run_target(target, html: str):
+    if not html or html.isspace():
+        return target.close()  # lxml raises on a document with no content
+    parser = etree.HTMLParser(target=target) if etree is not None else _TargetAdapter(target)
+    for start in range(0, len(html), FEED_CHUNK_SIZE):
+        parser.feed(html[start:start + FEED_CHUNK_SIZE])
+    return parser.close()
+
+def extract_article(html: str, max_bytes: int = MAX_HTML_BYTES) -> ExtractedArticle:
+    """Pick the article title and body text, dropping menus, banners and link lists."""
+    check_input_size(html, max_bytes)
+    return _run_target(ArticleExtractor(), html)
+
+def _synthetic_page(target_bytes: int) -> str:
+    """Build a news-like page of roughly target_bytes for benchmarking."""
+    head = (
+        "<html><head><title>Benchmark</title><style>body{margin:0}</style>"
+        "<script>var x = '<p>not text</p>';</script></head><body>"
+        "<header><nav><ul><li><a href='/'>Home</a></li><li><a href='/m'>Markets</a></li></ul></nav></header>"
+    )
+    block = (
+        "<div class='story'><h2>Stocks rally &amp; bonds slip</h2>"
+        "<p>Markets rose 2% on Tuesday as investors weighed the latest rate decision.</p>"
+        "<aside>Related: <a href='/x'>Five things to watch</a></aside>"
+        "<p>Analysts said the move was <b>broadly expected</b>.<br>More to follow.</p></div>"
+    )
+    tail = "<footer>&copy; Example News</footer></body></html>"
+    repeat = max(1, (target_bytes - len(head) - len(tail)) // len(block))
+    return head + block * repeat + tail
+
+def _synthetic_news_page() -> str:
+    """A typical news page: chrome, cookie banner, article, related links, comments."""
+    menu = "".join(f"<li><a href='/c/{i}'>Section {i}</a></li>" for i in range(40))
+    related = "".join(f"<li><a href='/a/{i}'>Related story number {i} about markets</a></li>" for i in range(30))
+    paragraphs = "".join(
+        f"<p>Paragraph {i}: the central bank held rates steady, citing sticky inflation, a cooling "
+        f"labour market and uncertainty over energy prices, while investors priced in cuts later "
+        f"this year. <a href='/x'>Bonds</a> rallied and the forint firmed against the euro.</p>"
+        for i in range(12)
+    )
+    return (
+        "<html><head><title>Rates on hold | Example News</title>"
+        "<meta property='og:title' content='Central bank keeps rates on hold'>"
+        + "<script>" + "var a=1;" * 4000 + "</script><style>" + "p{margin:0}" * 1000 + "</style></head><body>"
+        f"<div class='cookie-consent'>We use cookies to improve your experience. Accept all cookies?</div>"
+        f"<div class='top-menu'><ul>{menu}</ul></div>"
+        f"<div id='main-content'><article class='story'><h1>Central bank keeps rates on hold</h1>"
+        f"<div class='article-body'>{paragraphs}</div>"
+        f"<div class='share-tools'><a href='/s'>Share on social media</a></div></article>"
+        f"<div class='related-links'><h3>Related</h3><ul>{related}</ul></div></div>"
+        f"<div class='comments'><p>Reader comment: I think this is wrong, obviously, and so on.</p></div>"
+        "<footer>&copy; Example News</footer></body></html>"
+    )
+
+def _reference_text(page: str) -> str:
+    """What process_html_request returned before the streaming extractor (BeautifulSoup)."""
+    # bs4 is only needed for this comparison, so it isn't a module-level dependency
+    from bs4 import BeautifulSoup  # pylint: disable=import-outside-toplevel
+    soup = BeautifulSoup(page, 'html.parser')
+    for element in soup(list(SKIP_TAGS)):
+        element.decompose()
+    return soup.get_text(separator=' ', strip=True)
+
+def _compare_with_bs4(fixtures: dict) -> int:
+    """Check extract_text against BeautifulSoup on each fixture; returns the number of mismatches."""
+    mismatches = 0
+    for name, page in fixtures.items():
+        expected, actual = _reference_text(page), extract_text(page)
+        if expected != actual:
+            mismatches += 1
+            at = next((i for i, (a, b) in enumerate(zip(expected, actual)) if a != b), min(len(expected), len(actual)))
+            logging.warning(f"{name}: differs from bs4 at char {at}: "
+                            f"bs4 {expected[at:at + 60]!r}, streaming {actual[at:at + 60]!r}")
+    logging.info(f"bs4 comparison: {len(fixtures) - mismatches}/{len(fixtures)} fixtures identical")
+    return mismatches
+
+def _benchmark(paths):
+    """Evaluate the article scorer and the streaming extractor on HTML files, or on synthetic pages."""
+    fixtures = {}
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            fixtures[path] = f.read()
+    fixtures = fixtures or {"synthetic news page": _synthetic_news_page()}
+    logging.info(f"article backend: {'lxml' if etree is not None else 'html.parser'}")
+    for name, page in fixtures.items():
+        started = time.perf_counter()
+        article = extract_article(page)
+        elapsed = time.perf_counter() - started
+        logging.info(f"{name}: {len(page) / 1024:.0f} KB in {elapsed * 1000:.1f} ms, title {article.title!r}, "
+                     f"kept {len(article.text)} of {article.visible_chars} chars "
+                     f"(stripped {article.stripped_chars})")
+
+    try:
+        import bs4  # pylint: disable=unused-import,import-outside-toplevel  # Availability check only
+        has_bs4 = True
+    except ImportError:
+        has_bs4 = False
+    if has_bs4:
+        _compare_with_bs4(fixtures)
+
+    for size in (100 * 1024, 1024 * 1024, 10 * 1024 * 1024 - 1024):
+        page = _synthetic_page(size)
+        started = time.perf_counter()
+        streamed = extract_text(page)
+        elapsed = time.perf_counter() - started
+        logging.info(f"streaming: {len(page) / 1024:.0f} KB in {elapsed * 1000:.1f} ms")
+
+        if has_bs4:
+            started = time.perf_counter()
+            reference = _reference_text(page)
+            elapsed = time.perf_counter() - started
+            logging.info(f"bs4:       {len(page) / 1024:.0f} KB in {elapsed * 1000:.1f} ms, "
+                         f"identical output: {reference == streamed}")
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    _benchmark(sys.argv[1:])
@@ -4,10 +4,13 @@ Hybrid: google-genai for LLM + Gemini TTS for Audio
 """
 import os
 import json
+import time
+import hashlib
+import calendar
 import logging
-import concurrent.futures
-from typing import List, Dict, Optional
-from pydantic import BaseModel, Field
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, NamedTuple, Optional
+from pydantic import Field, create_model
 
 import feedparser
 from google.cloud import storage
@@ -16,12 +19,35 @@ from google.genai.types import GenerateContentConfig
 # from google.cloud import texttospeech
 from google.api_core.client_options import ClientOptions
 from google.cloud import texttospeech_v1beta1 as texttospeech
+from elevenlabs.client import ElevenLabs
 from pydub import AudioSegment
 
+from text_prep import prepare_tts_text
+from scheduler import DeadlineScheduler
+from concurrency import AdaptiveLimiter, QuotaExceeded, RetryAfter
+import bulletin
+import hls
+from checkpoint import RunCheckpoint
+from profiling import profiled
+from resilience import Backend, CircuitOpen, failover
+
 # --- Configuration ---
 PROJECT_ID = os.getenv("GCP_PROJECT")
 BUCKET_NAME = os.getenv("BUCKET_NAME")
-MAX_WORKERS = 5
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", "20"))  # Thread ceiling; the limiters below set actual concurrency
+MAX_ITEMS = 30
+MAX_ITEM_ATTEMPTS = 3  # Throttled items are requeued up to this many times, then deferred
+MAX_ITEM_FAILURES = 3  # Runs an item may fail in before it is given up and marked seen
+
+# Adaptive (AIMD) concurrency per backend, starting at the old fixed level
+INITIAL_CONCURRENCY = int(os.getenv("INITIAL_CONCURRENCY", "5"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "20"))
+TTS_MAX_CONCURRENCY = int(os.getenv("TTS_MAX_CONCURRENCY", "10"))
+
+# Scheduling: stop launching items once the budget can't cover a typical item's p95
+RUN_BUDGET_SECONDS = float(os.getenv("RUN_BUDGET_SECONDS", "480"))  # Function timeout is 540s
+DEFAULT_ITEM_SECONDS = float(os.getenv("DEFAULT_ITEM_SECONDS", "60"))
+LATENCY_HISTORY_SIZE = 50
 
 # CRITICAL: Force US-Central1 for AI models to avoid 404 errors in Europe
 AI_LOCATION = "us-central1" 
@@ -33,6 +59,15 @@ FEEDS = [
 ]
 KEYWORDS = ["Breaking", "Spike", "Drop", "Rate", "Record", "Surge", "Plunge", "Vote"]
 
+# Priority weights: score = feed weight * (recency + keyword weights)
+FEED_WEIGHTS = {
+    FEEDS[0]: 1.0,
+    FEEDS[1]: 1.2,
+}
+KEYWORD_WEIGHTS = {"Breaking": 5, "Plunge": 3, "Surge": 3, "Record": 2, "Rate": 2, "Spike": 2, "Drop": 1, "Vote": 1}
+RECENCY_WEIGHT = 10.0
+RECENCY_HALF_LIFE_HOURS = 1.0
+
 # --- AI Model Config ---
 # LLM: Summarizes the text
 LLM_MODEL_ID = "gemini-2.5-flash-lite" 
@@ -47,15 +82,45 @@ TTS_STYLE_PROMPT = (
     "Do not sound too happy, sound professional and serious."
 )
 
+# Fallback TTS when Gemini's circuit opens; only used if a key is set
+ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
+ELEVENLABS_VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID", "lVCldLIMCFckDUbGfwtx")
+ELEVENLABS_MODEL_ID = "eleven_turbo_v2_5"
+
+# Raw renders are resampled so items from either backend can share a bulletin/HLS stream
+OUTPUT_SAMPLE_RATE = 24000
+
 ARTICLE_LANG="Hungarian"
 
 TTS_LOCATION="global"
 
 LANGUAGE_CODE="hu-HU"
 
-class Article(BaseModel):
-    title: str = Field(description="Title of the article.")
-    article_body: str = Field(description="The body of the article.")
+class Language(NamedTuple):
+    code: str   # BCP-47, used for TTS and the output prefix
+    name: str   # As written in the LLM prompt
+    voice: str
+
+    @property
+    def field(self) -> str:
+        return self.code.replace("-", "_")
+
+def parse_languages(spec: str) -> List[Language]:
+    """Parse "hu-HU:Hungarian:Fenrir,en-US:English:Charon" into Language entries."""
+    return [Language(*[part.strip() for part in entry.split(":")]) for entry in spec.split(",") if entry.strip()]
+
+# Output languages: one LLM call per item writes every script, then each language
+# only adds its own TTS. The first language keeps the original news/ layout (and
+# the "news" HLS stream); the others go under news/<code>/ with their own bulletin.
+LANGUAGES = parse_languages(os.getenv("TARGET_LANGUAGES", f"{LANGUAGE_CODE}:{ARTICLE_LANG}:{TTS_VOICE_NAME}"))
+
+# Raw TTS renders keyed by model, voice, language, style and text (expire with a bucket lifecycle rule)
+TTS_CACHE_PREFIX = os.getenv("TTS_CACHE_PREFIX", "tts_cache")
+
+Scripts = create_model(
+    "Scripts",
+    **{lang.field: (str, Field(description=f"The script in {lang.name}.")) for lang in LANGUAGES},
+)
 
 # --- Client Initialization ---
 storage_client = storage.Client()
@@ -81,9 +146,12 @@ tts_client = texttospeech.TextToSpeechClient(
     client_options=ClientOptions(api_endpoint=API_ENDPOINT)
 )
 
-tts_voice = texttospeech.VoiceSelectionParams(
-    name=TTS_VOICE_NAME, language_code=LANGUAGE_CODE, model_name=TTS_MODEL_ID
-)
+elevenlabs_client = ElevenLabs(api_key=ELEVENLABS_API_KEY) if ELEVENLABS_API_KEY else None
+
+tts_voices = {
+    lang.code: texttospeech.VoiceSelectionParams(name=lang.voice, language_code=lang.code, model_name=TTS_MODEL_ID)
+    for lang in LANGUAGES
+}
 
 # tts_client_options = ClientOptions(
 #     api_endpoint=f"{AI_LOCATION}-texttospeech.googleapis.com"
@@ -94,6 +162,14 @@ tts_voice = texttospeech.VoiceSelectionParams(
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+llm_limiter = AdaptiveLimiter("llm", INITIAL_CONCURRENCY, max_limit=LLM_MAX_CONCURRENCY)
+tts_limiter = AdaptiveLimiter("tts", INITIAL_CONCURRENCY, max_limit=TTS_MAX_CONCURRENCY)
+elevenlabs_limiter = AdaptiveLimiter("elevenlabs", INITIAL_CONCURRENCY, max_limit=TTS_MAX_CONCURRENCY)
+
+# Hedged calls and circuit breakers per TTS backend
+gemini_backend = Backend("gemini_tts")
+elevenlabs_backend = Backend("elevenlabs")
+
 def fetch_and_filter_rss() -> List[Dict[str, str]]:
     items = []
     for url in FEEDS:
@@ -102,78 +178,168 @@ def fetch_and_filter_rss() -> List[Dict[str, str]]:
             for entry in feed.entries:
                 title = entry.get('title', '')
                 if any(k.lower() in title.lower() for k in KEYWORDS):
+                    published = entry.get('published_parsed')
                     items.append({
                         'title': title,
-                        'guid': entry.get('guid', entry.get('link'))
+                        'guid': entry.get('guid', entry.get('link')),
+                        'source': url,
+                        'published': calendar.timegm(published) if published else None
                     })
         except Exception as e:
             logger.error(f"Feed error {url}: {e}")
             continue
     return list({i['guid']: i for i in items}.values())
 
-def manage_history(bucket, new_guids):
+def score_item(item, now: float) -> float:
+    """Priority from recency, feed source and headline keywords."""
+    age_hours = (now - item['published']) / 3600 if item.get('published') else 24.0
+    recency = RECENCY_WEIGHT * 0.5 ** (max(0.0, age_hours) / RECENCY_HALF_LIFE_HOURS)
+    title = item['title'].lower()
+    keywords = sum(w for k, w in KEYWORD_WEIGHTS.items() if k.lower() in title)
+    return FEED_WEIGHTS.get(item.get('source'), 1.0) * (recency + keywords)
+
+def rank_items(items):
+    now = time.time()
+    return sorted(items, key=lambda i: score_item(i, now), reverse=True)
+
+def load_history(bucket):
     blob = bucket.blob('history.json')
-    history = json.loads(blob.download_as_string()) if blob.exists() else []
-    valid_guids = [g for g in new_guids if g not in history]
-    if valid_guids:
-        blob.upload_from_string(json.dumps((history + valid_guids)[-1000:]))
-    return valid_guids
+    return json.loads(blob.download_as_string()) if blob.exists() else []
+
+def commit_history(bucket, history, guids):
+    """Mark GUIDs as seen. Only called for items that were actually processed."""
+    new_guids = [g for g in guids if g not in history]
+    if new_guids:
+        bucket.blob('history.json').upload_from_string(json.dumps((history + new_guids)[-1000:]))
+
+def load_latency_history(bucket):
+    blob = bucket.blob('stats/item_latency.json')
+    return json.loads(blob.download_as_string()) if blob.exists() else []
+
+def save_latency_history(bucket, latencies):
+    if latencies:
+        bucket.blob('stats/item_latency.json').upload_from_string(json.dumps(latencies[-LATENCY_HISTORY_SIZE:]))
 
-def generate_script(news_item: Dict[str, str]) -> Optional[str]:
+def language_prefix(lang: Language) -> str:
+    return "news" if lang == LANGUAGES[0] else f"news/{lang.code}"
+
+def language_stream(lang: Language) -> str:
+    return "news" if lang == LANGUAGES[0] else f"news-{lang.code}"
+
+def generate_scripts(news_item: Dict[str, str]) -> Optional[Dict[str, str]]:
     """
-    Uses google-genai SDK (Gemini 2.5 Flash Lite) to summarize.
+    Uses google-genai SDK (Gemini 2.5 Flash Lite) to summarize. A single
+    structured call returns the script in every target language.
     """
+    languages = ", ".join(f"{lang.name} in the '{lang.field}' field" for lang in LANGUAGES)
     prompt = (
         "You are a Wall Street squawk box reporter."
-        f"Rewrite this headline into a concise 30-second script in {ARTICLE_LANG} for audio reading. "
+        f"Rewrite this headline into a concise 30-second script for audio reading, in {languages}. "
         "No introductions like 'Jó napot'. Just the facts. "
-        "ALWAYS spell out numbers. Your response shall only contain the article's text."
+        "ALWAYS spell out numbers. Every script shall contain the same facts and only the article's text.\n"
+        f"Headline: {news_item['title']}"
     )
     
     try:
-        response = ai_client.models.generate_content(
-            model=LLM_MODEL_ID,
-            contents=prompt,
-            config={
-                "response_mime_type": "application/json",
-                "response_json_schema": Article.model_json_schema(),
-            },
-        )
-        return Article.model_validate_json(response.text).strip()
+        with llm_limiter.slot():
+            response = ai_client.models.generate_content(
+                model=LLM_MODEL_ID,
+                contents=prompt,
+                config={
+                    "response_mime_type": "application/json",
+                    "response_json_schema": Scripts.model_json_schema(),
+                },
+            )
+        scripts = Scripts.model_validate_json(response.text)
+        scripts = {lang.code: getattr(scripts, lang.field).strip() for lang in LANGUAGES}
+        missing = [code for code, script in scripts.items() if not script]
+        if missing:
+            logger.error(f"LLM returned empty scripts for {missing}")
+            return None
+        return scripts
+    except QuotaExceeded:
+        raise  # Requeued by the scheduler
     except Exception as e:
         logger.error(f"LLM Generation Error: {e}")
         return None
 
-def generate_audio_gemini(text: str, output_filename: str) -> bool:
-    """
-    Uses the Gemini TTS model with Style Prompt.
-    """
-    try:
-        # Input with specific style prompt
+def synthesize_gemini(text: str, lang: Language) -> bytes:
+    # Input with specific style prompt
+    with tts_limiter.slot():
         response = tts_client.synthesize_speech(
             input=texttospeech.SynthesisInput(text=text, prompt=TTS_STYLE_PROMPT),
-            voice=tts_voice,
+            voice=tts_voices[lang.code],
             # Select the type of audio file you want returned
             audio_config=texttospeech.AudioConfig(
                 audio_encoding=texttospeech.AudioEncoding.MP3
             ),
         )
+    return response.audio_content
+
+def synthesize_elevenlabs(text: str, lang: Language) -> bytes:
+    # The stream is consumed here so the whole request is inside the hedged/limited call
+    with elevenlabs_limiter.slot():
+        chunks = elevenlabs_client.text_to_speech.convert(
+            voice_id=ELEVENLABS_VOICE_ID,
+            output_format="mp3_44100_128",
+            text=text,
+            model_id=ELEVENLABS_MODEL_ID,
+            language_code=lang.code.split("-")[0],
+        )
+        return b"".join(chunk for chunk in chunks if chunk)
+
+def generate_audio_gemini(text: str, output_filename: str, lang: Language = LANGUAGES[0]) -> Optional[str]:
+    """
+    Uses the Gemini TTS model with Style Prompt, hedging slow calls and failing
+    over to ElevenLabs while Gemini's circuit is open. text must already have
+    been through prepare_tts_text. Returns the backend used.
+    """
+    try:
+        calls = [(gemini_backend, lambda: synthesize_gemini(text, lang))]
+        if elevenlabs_client is not None:
+            calls.append((elevenlabs_backend, lambda: synthesize_elevenlabs(text, lang)))
+        backend, audio = failover(calls)
 
         with open(output_filename, "wb") as f:
-            f.write(response.audio_content)
+            f.write(audio)
         
-        return True
+        return backend
 
+    except (QuotaExceeded, CircuitOpen):
+        raise  # Requeued by the scheduler; CircuitOpen not before a breaker lets probes through
     except Exception as e:
         logger.error(f"Gemini TTS Error: {e}")
-        return False
+        return None
+
+def render_speech(text: str, lang: Language, bucket, output_filename: str) -> Optional[str]:
+    """
+    Raw TTS render through the shared cache, so identical (voice, language,
+    text) requests are only synthesized once. Returns the cached blob's name.
+    """
+    # Strip markdown/repeats and enforce the TTS budget before paying per character
+    prepared = prepare_tts_text(text)
+    key = json.dumps([TTS_MODEL_ID, lang.voice, lang.code, TTS_STYLE_PROMPT, prepared.text], ensure_ascii=False)
+    blob = bucket.blob(f"{TTS_CACHE_PREFIX}/{hashlib.sha256(key.encode('utf-8')).hexdigest()}.mp3")
+    if blob.exists():
+        blob.download_to_filename(output_filename)
+        logger.info(f"TTS cache hit for {lang.code}.")
+        return blob.name
+    backend = generate_audio_gemini(prepared.text, output_filename, lang)
+    if not backend:
+        return None
+    if backend != gemini_backend.name:
+        # Fallback renders aren't served for later Gemini requests, but still back the checkpoint
+        blob = bucket.blob(f"{TTS_CACHE_PREFIX}/{backend}/{blob.name.rsplit('/', 1)[-1]}")
+    blob.upload_from_filename(output_filename)
+    return blob.name
 
 def post_process_audio(voice_file: str, output_file: str):
     """
     Overlays background ticker noise using Pydub.
     """
     try:
-        voice = AudioSegment.from_mp3(voice_file)
+        # Gemini and ElevenLabs renders differ in format; one rate keeps bulletins and HLS continuous
+        voice = AudioSegment.from_mp3(voice_file).set_frame_rate(OUTPUT_SAMPLE_RATE).set_channels(1)
         if os.path.exists("/tmp/ticker.mp3"):
             bg = AudioSegment.from_mp3("/tmp/ticker.mp3")
             if len(bg) < len(voice):
@@ -187,42 +353,163 @@ def post_process_audio(voice_file: str, output_file: str):
         logger.error(f"Post-process error: {e}")
         return False
 
-def process_single_item(item, index, bucket):
-    script = generate_script(item)
-    if not script: return None
+def render_language(item, index, lang, script, bucket, checkpoint) -> bool:
+    """
+    Raw TTS -> post-processed final -> published for one language of an item,
+    resuming from the last stage recorded for that language.
+    """
+    guid = item['guid']
+    temp_raw = f"/tmp/raw_{lang.code}_{index}.mp3"
+    final_mp3 = f"/tmp/news_{lang.code}_{index:03d}.mp3"
 
-    temp_raw = f"/tmp/raw_{index}.mp3"
-    final_mp3 = f"/tmp/news_{index:03d}.mp3"
-    
-    # Using the GEMINI audio function now
-    if generate_audio_gemini(script, temp_raw):
-        if post_process_audio(temp_raw, final_mp3):
-            blob = bucket.blob(f"news/news_{index:03d}.mp3")
-            blob.upload_from_filename(final_mp3)
-            return f"news_{index:03d}.mp3"
-    return None
+    if checkpoint.reached(guid, "published", lang.code):
+        return True
 
+    # Stage 2: raw TTS render (the cache blob doubles as the checkpointed output)
+    if checkpoint.reached(guid, "raw", lang.code):
+        bucket.blob(checkpoint.render(guid, lang.code)['raw_blob']).download_to_filename(temp_raw)
+    else:
+        raw_blob = render_speech(script, lang, bucket, temp_raw)
+        if not raw_blob: return False
+        checkpoint.record(guid, "raw", lang.code, raw_blob=raw_blob)
+
+    # Stage 3: post-processed final audio
+    if checkpoint.reached(guid, "final", lang.code):
+        bucket.blob(checkpoint.render(guid, lang.code)['final_blob']).download_to_filename(final_mp3)
+    else:
+        if not post_process_audio(temp_raw, final_mp3): return False
+        if hls.writes_file():
+            final_blob = f"{language_prefix(lang)}/news_{index:03d}.mp3"
+        else:
+            final_blob = checkpoint.blob_path(f"{lang.code}/final_{index:03d}.mp3")
+        bucket.blob(final_blob).upload_from_filename(final_mp3)
+        checkpoint.record(guid, "final", lang.code, final_blob=final_blob)
+
+    # Stage 4: publish, unless the run stopped while this item was still rendering
+    if checkpoint.closed: return False
+    if hls.writes_hls():
+        with open(final_mp3, "rb") as f:
+            hls.append_audio(bucket, language_stream(lang), f.read(), item['title'])
+    checkpoint.record(guid, "published", lang.code)
+    return True
+
+def process_single_item(item, index, bucket, checkpoint):
+    """
+    Scripts for every language from one LLM call, then each language's
+    render in parallel, resuming from the stages recorded in the run checkpoint.
+    """
+    guid = item['guid']
+    name = f"news_{index:03d}.mp3"
+
+    if checkpoint.reached(guid, "published"):
+        return name
+
+    # Stage 1: LLM scripts, all languages at once
+    scripts = checkpoint.get(guid).get('scripts')
+    if not scripts:
+        scripts = generate_scripts(item)
+        if not scripts: return None
+        checkpoint.record(guid, "script", scripts=scripts)
+
+    # Each language adds only its own TTS and post-processing
+    with ThreadPoolExecutor(max_workers=len(LANGUAGES)) as pool:
+        rendered = list(pool.map(
+            lambda lang: render_language(item, index, lang, scripts[lang.code], bucket, checkpoint), LANGUAGES
+        ))
+    if not all(rendered): return None
+
+    checkpoint.record(guid, "published")
+    return name
+
+@profiled
 def entry_point(request):
     bucket = storage_client.bucket(BUCKET_NAME)
-    
+    scheduler = DeadlineScheduler(
+        RUN_BUDGET_SECONDS, MAX_WORKERS,
+        latency_history=load_latency_history(bucket),
+        default_latency=DEFAULT_ITEM_SECONDS,
+    )
+
     # Download background asset
     blob_bg = bucket.blob('assets/ticker_bg.mp3')
     if blob_bg.exists():
         blob_bg.download_to_filename('/tmp/ticker.mp3')
-    
-    raw_items = fetch_and_filter_rss()
-    valid_guids = manage_history(bucket, [i['guid'] for i in raw_items])
-    items = [i for i in raw_items if i['guid'] in valid_guids][:30]
-
-    if not items: return "No new items.", 200
 
-    # Clean bucket
-    blobs = list(bucket.list_blobs(prefix="news/"))
-    bucket.delete_blobs(blobs)
-
-    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = [executor.submit(process_single_item, item, i, bucket) for i, item in enumerate(items, 1)]
-        results = [f.result() for f in concurrent.futures.as_completed(futures)]
-    
-    count = len([r for r in results if r])
-    return f"Generated {count} news items with Gemini TTS.", 200
\ No newline at end of file
+    history = load_history(bucket)
+    checkpoint = RunCheckpoint.load(bucket)
+    fresh = [i for i in fetch_and_filter_rss()
+             if i['guid'] not in history and not (checkpoint and checkpoint.has(i['guid']))]
+
+    if checkpoint is None:
+        if not fresh: return "No new items.", 200
+        checkpoint = RunCheckpoint.start(bucket)
+
+        # Clean bucket
+        blobs = list(bucket.list_blobs(prefix="news/"))
+        bucket.delete_blobs(blobs)
+
+    # A resumed run only finishes its own items; new ones wait for the next run, so a run
+    # (and its bulletin) never holds more than MAX_ITEMS
+    if not checkpoint.has_items():
+        checkpoint.add_items(rank_items(fresh)[:MAX_ITEMS])
+    items = checkpoint.pending_items()
+
+    outcome = scheduler.run(
+        items,
+        lambda item, _: process_single_item(item, checkpoint.get(item['guid'])['index'], bucket, checkpoint),
+        requeue_on=(QuotaExceeded, RetryAfter), max_attempts=MAX_ITEM_ATTEMPTS,
+    )
+    # Items still running past the grace period may finish later; they must not record or publish
+    checkpoint.close()
+
+    # Failed items, and throttled ones out of attempts, are retried by later runs up to MAX_ITEM_FAILURES
+    given_up = []
+    failed = [item for item, result in outcome.completed if not result] + list(outcome.exhausted)
+    for item in failed:
+        if checkpoint.record_failure(item['guid']) >= MAX_ITEM_FAILURES:
+            logger.warning(f"Giving up on {item['guid']} after {MAX_ITEM_FAILURES} failed runs.")
+            checkpoint.drop(item['guid'])
+            given_up.append(item['guid'])
+
+    # Only published items become history; deferred and retryable items stay in the checkpoint
+    published = checkpoint.published()
+    commit_history(bucket, history, [e['item']['guid'] for e in published] + given_up)
+    save_latency_history(bucket, scheduler.history + outcome.latencies)
+
+    count = len([r for _, r in outcome.completed if r])
+
+    # Join every item published in this run, in priority order, into one continuous bulletin per language
+    if bulletin.BULLETIN_ENABLED and published:
+        for lang in LANGUAGES:
+            try:
+                entries = []
+                for entry in published:
+                    local = f"/tmp/news_{lang.code}_{entry['index']:03d}.mp3"
+                    if not os.path.exists(local):
+                        bucket.blob(entry['renders'][lang.code]['final_blob']).download_to_filename(local)
+                    entries.append((entry['item']['title'], local))
+                bulletin.publish_bulletin(bucket, entries, prefix=language_prefix(lang))
+            except Exception as e:
+                logger.error(f"Bulletin assembly error ({lang.code}): {e}")
+
+    pending = checkpoint.pending_items()
+    if not pending:
+        checkpoint.finish()
+
+    metrics = {
+        "run_id": checkpoint.run_id,
+        "languages": [lang.code for lang in LANGUAGES],
+        "generated": count,
+        "published_total": len(published),
+        "completed": len(outcome.completed),
+        "deferred": len(outcome.deferred),
+        "pending": len(pending),
+        "requeued": outcome.requeued,
+        "llm": llm_limiter.metrics(),
+        "tts": tts_limiter.metrics(),
+        "elevenlabs": elevenlabs_limiter.metrics(),
+        "tts_backends": {b.name: b.metrics() for b in (gemini_backend, elevenlabs_backend)},
+    }
+    logger.info(f"Run metrics: {json.dumps(metrics)}")
+    bucket.blob('stats/last_run.json').upload_from_string(json.dumps(metrics), content_type="application/json")
+    return f"Generated {count} news items with Gemini TTS; {len(pending)} pending for the next run.", 200
@@ -0,0 +1,192 @@
+"""
+Frame-level MP3 (MPEG audio Layer III) helpers: parse frame headers, strip
+ID3/Xing/Info metadata frames, and build silent frames and Xing/LAME headers
+without decoding or encoding any audio.
+"""
+import struct
+from typing import List, NamedTuple, Optional, Tuple
+
+# Layer III bitrates in kbps by index, for MPEG-1 and MPEG-2/2.5
+BITRATES_V1 = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+BITRATES_V2 = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+
+# Sample rates by version bits (00 = 2.5, 10 = 2, 11 = 1)
+SAMPLE_RATES = {0b11: (44100, 48000, 32000), 0b10: (22050, 24000, 16000), 0b00: (11025, 12000, 8000)}
+
+XING_FLAGS = 0x0F  # frames, bytes, TOC and quality fields present
+XING_BODY_SIZE = 4 + 4 + 4 + 4 + 100 + 4  # "Xing", flags, frames, bytes, TOC, quality
+LAME_TAG_SIZE = 36
+LAME_VENDORS = (b"LAME", b"Lavf", b"Lavc")
+LAME_VERSION = b"LAME3.100"
+
+class FrameHeader(NamedTuple):
+    version_bits: int  # 0b11 MPEG-1, 0b10 MPEG-2, 0b00 MPEG-2.5
+    bitrate_index: int
+    sample_rate_index: int
+    padding: int
+    channel_mode: int  # 0b11 is mono
+    size: int
+    sample_rate: int
+
+    @property
+    def samples(self) -> int:
+        return 1152 if self.version_bits == 0b11 else 576
+
+    @property
+    def duration(self) -> float:
+        return self.samples / self.sample_rate
+
+    def compatible(self, other: "FrameHeader") -> bool:
+        """Frames can share a stream if version, sample rate and channel mode match."""
+        return (self.version_bits == other.version_bits and self.sample_rate == other.sample_rate
+                and self.channel_mode == other.channel_mode)
+
+def _frame_size(version_bits, bitrate_kbps, sample_rate, padding) -> int:
+    coefficient = 144 if version_bits == 0b11 else 72
+    return coefficient * bitrate_kbps * 1000 // sample_rate + padding
+
+def parse_header(data: bytes, offset: int) -> Optional[FrameHeader]:
+    """Parse a Layer III frame header at offset, or return None."""
+    if offset + 4 > len(data) or data[offset] != 0xFF or (data[offset + 1] & 0xE0) != 0xE0:
+        return None
+    b1, b2, b3 = data[offset + 1], data[offset + 2], data[offset + 3]
+    version_bits = (b1 >> 3) & 0b11
+    layer_bits = (b1 >> 1) & 0b11
+    bitrate_index = b2 >> 4
+    sample_rate_index = (b2 >> 2) & 0b11
+    if version_bits == 0b01 or layer_bits != 0b01 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    bitrates = BITRATES_V1 if version_bits == 0b11 else BITRATES_V2
+    sample_rate = SAMPLE_RATES[version_bits][sample_rate_index]
+    padding = (b2 >> 1) & 1
+    size = _frame_size(version_bits, bitrates[bitrate_index], sample_rate, padding)
+    return FrameHeader(version_bits, bitrate_index, sample_rate_index, padding, b3 >> 6, size, sample_rate)
+
+def skip_id3v2(data: bytes) -> int:
+    """Offset of the first byte after a leading ID3v2 tag."""
+    if len(data) >= 10 and data[:3] == b"ID3":
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+def side_info_size(header: FrameHeader) -> int:
+    mono = header.channel_mode == 0b11
+    if header.version_bits == 0b11:
+        return 17 if mono else 32
+    return 9 if mono else 17
+
+def is_info_frame(data: bytes, offset: int, header: FrameHeader) -> bool:
+    """True for Xing/Info/VBRI metadata frames, which carry no audio."""
+    tag_offset = offset + 4 + side_info_size(header)
+    return data[tag_offset:tag_offset + 4] in (b"Xing", b"Info") or data[offset + 36:offset + 40] == b"VBRI"
+
+def iter_frames(data: bytes):
+    """Yield (offset, header) for each audio frame, resyncing over junk bytes."""
+    end = len(data) - 128 if data[-128:-125] == b"TAG" else len(data)  # ID3v1
+    offset = skip_id3v2(data)
+    first = True
+    while offset < end:
+        header = parse_header(data, offset)
+        if header is None or offset + header.size > end:
+            offset += 1
+            continue
+        # Require the next header to line up to avoid false syncs inside payloads
+        following = offset + header.size
+        if following < end and parse_header(data, following) is None:
+            offset += 1
+            continue
+        if not (first and is_info_frame(data, offset, header)):
+            yield offset, header
+        first = False
+        offset = following
+
+def gapless_info(data: bytes) -> Optional[Tuple[int, int]]:
+    """(encoder delay, padding) in samples from the LAME tag of a Xing/Info frame, if there is one."""
+    offset = skip_id3v2(data)
+    header = parse_header(data, offset)
+    if header is None or not is_info_frame(data, offset, header):
+        return None
+    position = offset + 4 + side_info_size(header)
+    if data[position:position + 4] not in (b"Xing", b"Info"):
+        return None
+    flags = struct.unpack(">I", data[position + 4:position + 8])[0]
+    position += 8 + sum(size for bit, size in ((1, 4), (2, 4), (4, 100), (8, 4)) if flags & bit)
+    tag = data[position:position + LAME_TAG_SIZE]
+    if len(tag) < LAME_TAG_SIZE or tag[:4] not in LAME_VENDORS:
+        return None
+    packed = int.from_bytes(tag[21:24], "big")
+    return packed >> 12, packed & 0xFFF
+
+def crc16(data: bytes) -> int:
+    """CRC-16 (polynomial 0x8005, reflected) as used by the LAME tag."""
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+def audio_frames(data: bytes) -> List[bytes]:
+    """Split MP3 bytes into audio frames, dropping ID3 tags and the Xing/Info frame."""
+    view = memoryview(data)
+    return [view[offset:offset + header.size] for offset, header in iter_frames(data)]
+
+def first_header(data: bytes) -> Optional[FrameHeader]:
+    for _, header in iter_frames(data):
+        return header
+    return None
+
+def header_bytes(template: FrameHeader, bitrate_index: int, padding: int = 0) -> bytes:
+    """Encode a frame header (no CRC, not private, not copyrighted, original)."""
+    b1 = 0xE0 | (template.version_bits << 3) | (0b01 << 1) | 1
+    b2 = (bitrate_index << 4) | (template.sample_rate_index << 2) | (padding << 1)
+    b3 = (template.channel_mode << 6) | 0b0100
+    return bytes((0xFF, b1, b2, b3))
+
+def silent_frame(template: FrameHeader) -> bytes:
+    """A frame with zeroed side info: decoders output silence, no encoder needed."""
+    frame = header_bytes(template, template.bitrate_index)
+    return frame + b"\x00" * (template.size - template.padding - len(frame))
+
+def silence(template: FrameHeader, seconds: float) -> List[bytes]:
+    frame = silent_frame(template)
+    return [frame] * max(1, round(seconds / template.duration))
+
+def lame_tag(total_bytes: int, delay: int, padding: int) -> bytes:
+    """LAME tag without its CRC: only the version, gapless and music length fields are set."""
+    gapless = (min(delay, 0xFFF) << 12 | min(padding, 0xFFF)).to_bytes(3, "big")
+    return LAME_VERSION + b"\x00" * 12 + gapless + b"\x00" * 4 + struct.pack(">IH", total_bytes, 0)
+
+def xing_frame(template: FrameHeader, frame_sizes: List[int], gapless: Tuple[int, int] = (0, 0)) -> bytes:
+    """
+    Build a Xing header frame for the given audio frames: frame count, total
+    byte count (including this frame), a 100-entry seek TOC and a LAME tag
+    carrying the (encoder delay, padding) in samples for gapless playback.
+    """
+    body_offset = 4 + side_info_size(template)
+    needed = body_offset + XING_BODY_SIZE + LAME_TAG_SIZE
+    bitrates = BITRATES_V1 if template.version_bits == 0b11 else BITRATES_V2
+    for bitrate_index in range(1, 15):
+        size = _frame_size(template.version_bits, bitrates[bitrate_index], template.sample_rate, 0)
+        if size >= needed:
+            break
+
+    total_bytes = size + sum(frame_sizes)
+    frame_count = len(frame_sizes)
+
+    # Byte offset at which each frame starts, relative to the file start
+    offsets, position = [], size
+    for frame_size in frame_sizes:
+        offsets.append(position)
+        position += frame_size
+    toc = bytes(
+        min(255, offsets[min(frame_count - 1, i * frame_count // 100)] * 256 // total_bytes) if frame_count else 0
+        for i in range(100)
+    )
+
+    frame = (header_bytes(template, bitrate_index) + b"\x00" * (body_offset - 4)
+             + b"Xing" + struct.pack(">III", XING_FLAGS, frame_count, total_bytes) + toc + struct.pack(">I", 0)
+             + lame_tag(total_bytes, *gapless))
+    frame += struct.pack(">H", crc16(frame))
+    return frame + b"\x00" * (size - len(frame))
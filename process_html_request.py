@@ -5,8 +5,15 @@ from datetime import datetime
 from supabase import create_client, Client
 from google.cloud import pubsub_v1
 import json
+import io
+import gzip
+import multiprocessing
+import concurrent.futures
+from functools import lru_cache
 from openai import OpenAI
-from bs4 import BeautifulSoup  # For HTML parsing
+
+from html_extractor import extract_article
+from profiling import profiled
 
 # Environment Variables
 SUPABASE_URL = os.getenv("SUPABASE_URL")
@@ -19,6 +26,22 @@ bucket_name = os.getenv("GCS_BUCKET_NAME", "news_audio_bucket")  # Default bucke
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 # client = OpenAI()
 
+# Batch ingestion limits
+MAX_BATCH_PAGES = int(os.getenv("MAX_BATCH_PAGES", "500"))
+MAX_BATCH_BYTES = int(os.getenv("MAX_BATCH_BYTES", str(64 * 1024 * 1024)))  # After decompression
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+
+# Pub/Sub client is shared across requests so batched messages can be flushed together
+@lru_cache(maxsize=None)
+def get_publisher():
+    """Return the shared, batching Pub/Sub publisher."""
+    batch_settings = pubsub_v1.types.BatchSettings(
+        max_messages=100,
+        max_bytes=1024 * 1024,
+        max_latency=0.05,
+    )
+    return pubsub_v1.PublisherClient(batch_settings=batch_settings)
+
 NUMBER_WORDS_HU = {
     0: "nulla",
     1: "egy",
@@ -103,40 +126,46 @@ def clean_text(text: str) -> str:
     return cleaned_text
 
 def extract_main_content(html: str) -> str:
-    """Extract main content from HTML using BeautifulSoup."""
-    soup = BeautifulSoup(html, 'html.parser')
+    """Extract the article body from HTML in a single streaming pass."""
+    return extract_article(html).text
 
-    # Remove scripts, styles, and unnecessary tags
-    for tag in soup(['script', 'style', 'header', 'footer', 'nav', 'aside']):
-        tag.decompose()
+def build_article_data(page_id: str, html: str) -> dict:
+    """Extract and clean HTML content into an article row."""
+    article = extract_article(html)
+    cleaned_text = clean_text(article.text)
+    logging.info(f"Kept {len(article.text)} of {article.visible_chars} visible characters for page {page_id}.")
 
-    # Extract visible text
-    text = soup.get_text(separator=' ', strip=True)
-    return text
+    return {
+        "id": page_id,  # Use page_id as the article ID
+        "title": article.title or str(page_id),  # Page title, falling back to the ID
+        "description": cleaned_text[:100],  # Cleaned content as description
+        "pub_date": datetime.now().isoformat(),  # Placeholder publication date
+        "link": f"https://example.com/articles/{page_id}",  # Placeholder link
+        "category": "Uncategorized"  # Default category
+    }
+
+def build_article_message(article_data: dict) -> bytes:
+    """Encode the articles-saved Pub/Sub payload for an article row."""
+    message = {
+        "article_id": str(article_data["id"]),
+        "title": article_data["title"],
+        "description": article_data["description"],
+        "pub_date": article_data["pub_date"],
+        "link": article_data["link"]
+    }
+    return json.dumps(message).encode("utf-8")
 
 def process_html_and_publish(page_id: str, html: str):
     """Process HTML content, save to Supabase, and publish to Pub/Sub."""
-    publisher = pubsub_v1.PublisherClient()
+    publisher = get_publisher()
     topic_path = publisher.topic_path(GOOGLE_CLOUD_PROJECT, "articles-saved")  # Use the existing topic
 
     try:
-        # Step 1: Extract and clean HTML content
+        # Step 1: Extract, clean and prepare article data
         logging.info("Extracting and cleaning HTML content.")
-        main_content = extract_main_content(html)
-        cleaned_text = clean_text(main_content)
-
-        # Step 2: Prepare article data
-        logging.info("Preparing article data.")
-        article_data = {
-            "id": page_id,  # Use page_id as the article ID
-            "title": f"Test Title for {page_id}",  # Placeholder for title
-            "description": cleaned_text[:100],  # Cleaned content as description
-            "pub_date": datetime.now().isoformat(),  # Placeholder publication date
-            "link": f"https://example.com/articles/{page_id}",  # Placeholder link
-            "category": "Uncategorized"  # Default category
-        }
-
-        # Step 3: Insert article into Supabase
+        article_data = build_article_data(page_id, html)
+
+        # Step 2: Insert article into Supabase
         logging.info(f"Inserting article with ID {page_id} into Supabase.")
         response = supabase.table("article").insert(article_data).execute()
 
@@ -146,18 +175,9 @@ def process_html_and_publish(page_id: str, html: str):
 
         logging.info(f"Article successfully saved with ID {page_id}.")
 
-        # Step 4: Publish cleaned content to Pub/Sub
+        # Step 3: Publish cleaned content to Pub/Sub
         logging.info(f"Publishing message for article ID {page_id} to Pub/Sub.")
-        message = {
-            "article_id": str(page_id),
-            "title": article_data["title"],
-            "description": article_data["description"],
-            "pub_date": article_data["pub_date"],
-            "link": article_data["link"]
-        }
-
-        # Publish the message
-        future = publisher.publish(topic_path, json.dumps(message).encode("utf-8"))
+        future = publisher.publish(topic_path, build_article_message(article_data))
         pubsub_message_id = future.result()
         logging.info(f"Message published to Pub/Sub with ID: {pubsub_message_id}")
 
@@ -167,6 +187,7 @@ def process_html_and_publish(page_id: str, html: str):
         logging.error(f"Error in process_html_and_publish: {e}")
         raise
 
+@profiled
 def process_html_request(request):
     """Entry point for processing HTML requests."""
     if request.method != 'POST':
@@ -185,3 +206,130 @@ def process_html_request(request):
     except Exception as e:
         logging.error(f"Error processing request: {e}")
         return {"status": "error", "message": str(e)}, 500
+
+def parse_batch_body(request) -> list:
+    """Decode a JSON array or NDJSON request body, optionally gzip-compressed."""
+    raw = request.get_data()
+    if request.headers.get("Content-Encoding", "").lower() == "gzip" or raw[:2] == b"\x1f\x8b":
+        with gzip.GzipFile(fileobj=io.BytesIO(raw)) as f:
+            raw = f.read(MAX_BATCH_BYTES + 1)
+    if len(raw) > MAX_BATCH_BYTES:
+        raise ValueError(f"Batch body exceeds the {MAX_BATCH_BYTES} byte limit.")
+
+    body = raw.decode("utf-8").strip()
+    if body.startswith("["):
+        pages = json.loads(body)
+    else:
+        pages = [json.loads(line) for line in body.splitlines() if line.strip()]
+
+    if len(pages) > MAX_BATCH_PAGES:
+        raise ValueError(f"Batch contains {len(pages)} pages; the limit is {MAX_BATCH_PAGES}.")
+    return pages
+
+def extract_page(page: dict) -> dict:
+    """Build the article row for one batch entry. Runs in a worker process."""
+    page_id = page.get('page_id') if isinstance(page, dict) else None
+    html_content = page.get('html') if isinstance(page, dict) else None
+    if not page_id or not html_content:
+        return {"page_id": page_id, "error": "Missing required fields: 'page_id' and 'html'."}
+    try:
+        return {"page_id": page_id, "article": build_article_data(page_id, html_content)}
+    except Exception as e:
+        return {"page_id": page_id, "error": str(e)}
+
+def insert_articles(extracted: list):
+    """
+    Insert the extracted rows in one request. If that fails (e.g. one page_id
+    already exists), fall back to one insert per row so only the conflicting
+    pages are marked as errors.
+    """
+    rows = [r["article"] for r in extracted]
+    logging.info(f"Bulk inserting {len(rows)} articles into Supabase.")
+    try:
+        supabase.table("article").insert(rows).execute()
+        return
+    except Exception as e:
+        logging.warning(f"Bulk insert failed, inserting rows one by one: {e}")
+    for r in extracted:
+        try:
+            supabase.table("article").insert(r["article"]).execute()
+        except Exception as e:
+            logging.error(f"Insert failed for article ID {r['page_id']}: {e}")
+            r["error"] = f"Supabase error: {e}"
+            del r["article"]
+
+def process_html_batch(pages: list) -> list:
+    """Extract pages in parallel, bulk-insert them and publish one message per saved article."""
+    # Only the first entry of a repeated page_id is processed
+    seen = set()
+    unique, duplicates = [], {}
+    for n, page in enumerate(pages):
+        page_id = page.get('page_id') if isinstance(page, dict) else None
+        if page_id and page_id in seen:
+            duplicates[n] = {"page_id": page_id, "error": "Duplicate page_id in batch."}
+            continue
+        seen.add(page_id)
+        unique.append(page)
+
+    # Step 1: Extract in a process pool; the parser is CPU-bound. Workers are spawned,
+    # not forked, because forking a process with live gRPC/HTTP client threads can deadlock
+    if len(unique) > 1 and EXTRACT_WORKERS > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(EXTRACT_WORKERS, len(unique)),
+                                                    mp_context=multiprocessing.get_context("spawn")) as executor:
+            chunksize = max(1, len(unique) // (EXTRACT_WORKERS * 4))
+            extracted_pages = iter(executor.map(extract_page, unique, chunksize=chunksize))
+    else:
+        extracted_pages = iter([extract_page(page) for page in unique])
+    results = [duplicates.get(n) or next(extracted_pages) for n in range(len(pages))]
+
+    extracted = [r for r in results if "article" in r]
+    if not extracted:
+        return results
+
+    # Step 2: One bulk insert for every successfully extracted page
+    insert_articles(extracted)
+    extracted = [r for r in extracted if "article" in r]
+
+    # Step 3: Publish with client-side batching, then wait for every future
+    publisher = get_publisher()
+    topic_path = publisher.topic_path(GOOGLE_CLOUD_PROJECT, "articles-saved")
+    futures = [(r, publisher.publish(topic_path, build_article_message(r["article"]))) for r in extracted]
+    for r, future in futures:
+        try:
+            r["message_id"] = future.result()
+        except Exception as e:
+            logging.error(f"Failed to publish message for article ID {r['page_id']}: {e}")
+            r["error"] = f"Publish error: {e}"
+    logging.info(f"Published {len([r for r in extracted if 'message_id' in r])} of {len(extracted)} messages.")
+    return results
+
+@profiled
+def process_html_batch_request(request):
+    """Entry point for bulk ingestion: a JSON array or NDJSON of {page_id, html}."""
+    if request.method != 'POST':
+        return "Method not allowed", 405
+
+    try:
+        pages = parse_batch_body(request)
+    except Exception as e:
+        logging.error(f"Error parsing batch request: {e}")
+        return {"status": "error", "message": str(e)}, 400
+
+    try:
+        results = process_html_batch(pages)
+    except Exception as e:
+        logging.error(f"Error processing batch request: {e}")
+        return {"status": "error", "message": str(e)}, 500
+
+    report = []
+    for r in results:
+        entry = {"page_id": r["page_id"], "status": "error" if "error" in r else "success"}
+        if "error" in r:
+            entry["message"] = r["error"]
+        else:
+            entry["message_id"] = r.get("message_id")
+        report.append(entry)
+
+    failed = len([e for e in report if e["status"] == "error"])
+    status = "success" if not failed else ("error" if failed == len(report) else "partial")
+    return {"status": status, "saved": len(report) - failed, "failed": failed, "results": report}, 200
@@ -0,0 +1,176 @@
+"""
+Opt-in memory and CPU profiling for Cloud Function entry points.
+
+With PROFILE_ENABLED=1, each decorated call records its tracemalloc peak and
+top allocation sites, process RSS and (if PROFILE_CPU_INTERVAL > 0) sampled
+CPU stacks, then writes a compact JSON report to PROFILE_OUTPUT, a local
+directory or gs://bucket/prefix. When disabled, the decorator returns the
+function unchanged. Concurrent calls share one tracemalloc session, so their
+reports set shared_tracing. A profiling failure is logged and never replaces
+the function's own result or exception.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import resource
+import threading
+import functools
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "0") == "1"
+PROFILE_OUTPUT = os.getenv("PROFILE_OUTPUT", "/tmp/profiles")
+PROFILE_CPU_INTERVAL = float(os.getenv("PROFILE_CPU_INTERVAL", "0"))  # Seconds between stack samples; 0 disables
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "15"))
+PROFILE_TRACE_FRAMES = 10  # Stack depth tracemalloc keeps per allocation
+STACK_DEPTH = 12  # Innermost frames kept per CPU sample
+
+# Innermost frames of threads blocked waiting for work; these samples are dropped
+IDLE_FRAMES = {("threading.py", "wait"), ("queue.py", "get"), ("thread.py", "_worker"), ("selectors.py", "select")}
+
+class StackSampler(threading.Thread):
+    """Periodically samples the stacks of all other threads, counting folded stacks."""
+
+    def __init__(self, interval: float):
+        super().__init__(name="profiling-sampler", daemon=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            # No public API returns every thread's current frame
+            for thread_id, frame in sys._current_frames().items():  # pylint: disable=protected-access
+                if thread_id == self.ident:
+                    continue
+                if (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < STACK_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self) -> dict:
+        self.stopped.set()
+        self.join()
+        return {
+            "interval_seconds": self.interval,
+            "samples": self.samples,
+            "top": [{"stack": stack, "count": count} for stack, count in self.stacks.most_common(PROFILE_TOP_N)],
+        }
+
+class TracingSession:
+    """
+    Reference-counted tracemalloc session: concurrent and nested profiled calls
+    share it, and the last one out stops it (unless something else started it).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users = 0
+        self.owned = False
+
+    def acquire(self) -> bool:
+        """Start tracing if needed; True if another call or the host is tracing too."""
+        with self.lock:
+            if self.users == 0:
+                self.owned = not tracemalloc.is_tracing()
+                if self.owned:
+                    tracemalloc.start(PROFILE_TRACE_FRAMES)
+            self.users += 1
+            return self.users > 1 or not self.owned
+
+    def release(self):
+        with self.lock:
+            self.users -= 1
+            if self.users == 0 and self.owned:
+                tracemalloc.stop()
+
+_tracing = TracingSession()
+
+def _allocation_sites(snapshot) -> list:
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ))
+    return [
+        {"site": f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+         "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+        for stat in snapshot.statistics("lineno")[:PROFILE_TOP_N]
+    ]
+
+def _max_rss_mb(who) -> float:
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)  # ru_maxrss is in KiB on Linux
+
+def write_report(report: dict):
+    name = f"{report['function']}_{report['started'].replace(':', '')}_{os.getpid()}_{threading.get_native_id()}.json"
+    data = json.dumps(report, indent=1)
+    if PROFILE_OUTPUT.startswith("gs://"):
+        from google.cloud import storage
+        bucket_name, _, prefix = PROFILE_OUTPUT[len("gs://"):].partition("/")
+        path = f"{prefix.rstrip('/')}/{name}" if prefix else name
+        storage.Client().bucket(bucket_name).blob(path).upload_from_string(data, content_type="application/json")
+        logger.info(f"Profile written to gs://{bucket_name}/{path}")
+    else:
+        os.makedirs(PROFILE_OUTPUT, exist_ok=True)
+        with open(os.path.join(PROFILE_OUTPUT, name), "w", encoding="utf-8") as f:
+            f.write(data)
+        logger.info(f"Profile written to {os.path.join(PROFILE_OUTPUT, name)}")
+
+def profiled(func):
+    """Profile each call of func when PROFILE_ENABLED=1; otherwise return func as is."""
+    if not PROFILE_ENABLED:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        shared_tracing = _tracing.acquire()
+        sampler = StackSampler(PROFILE_CPU_INTERVAL) if PROFILE_CPU_INTERVAL > 0 else None
+        if sampler:
+            sampler.start()
+        started = datetime.now(timezone.utc)
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        error = None
+        try:
+            return func(*args, **kwargs)
+        except BaseException as e:
+            error = repr(e)
+            raise
+        finally:
+            # Profiling must never replace the call's own result or exception
+            try:
+                cpu = sampler.stop() if sampler else None
+                current, peak = tracemalloc.get_traced_memory()
+                report = {
+                    "function": func.__name__,
+                    "host": socket.gethostname(),
+                    "started": started.isoformat(timespec="seconds"),
+                    "wall_seconds": round(time.perf_counter() - wall_start, 3),
+                    "cpu_seconds": round(time.process_time() - cpu_start, 3),
+                    "error": error,
+                    "traced_peak_mb": round(peak / (1024 * 1024), 2),
+                    "traced_current_mb": round(current / (1024 * 1024), 2),
+                    "shared_tracing": shared_tracing,
+                    "max_rss_mb": _max_rss_mb(resource.RUSAGE_SELF),
+                    "children_max_rss_mb": _max_rss_mb(resource.RUSAGE_CHILDREN),  # ffmpeg under pydub
+                    "top_allocations": _allocation_sites(tracemalloc.take_snapshot()),
+                }
+                if cpu:
+                    report["cpu"] = cpu
+                write_report(report)
+            except Exception as e:
+                logger.warning(f"Profiling report for {func.__name__} failed: {e}")
+            finally:
+                _tracing.release()
+
+    return wrapper
@@ -0,0 +1,231 @@
+"""
+Tail-latency and failure handling for TTS backends: request hedging (fire a
+duplicate once a call runs past the observed p95, keep whichever finishes
+first, within a cap on the hedged fraction) and per-backend circuit breakers
+that let callers fail over to another backend while one is erroring.
+A single failed call is not retried elsewhere: later backends are only used
+while the earlier circuits are open. Quota errors don't count as failures, and
+when every circuit is open the caller gets CircuitOpen with the shortest
+remaining cooldown as retry_after.
+"""
+import os
+import time
+import math
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, List, Optional, Tuple
+
+from concurrency import QuotaExceeded, RetryAfter, is_quota_error
+
+logger = logging.getLogger(__name__)
+
+HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", "0.95"))
+HEDGE_MAX_FRACTION = float(os.getenv("HEDGE_MAX_FRACTION", "0.1"))  # 0 disables hedging
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "1.0"))  # Seconds; never hedge sooner than this
+HEDGE_MIN_SAMPLES = 20  # Latencies needed before the quantile is trusted
+HEDGE_HISTORY = 200
+
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))  # Recent calls the error rate is taken over
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_MIN_CALLS = 5
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))  # Seconds open before a probe call
+
+class CircuitOpen(RetryAfter):
+    """Every backend's breaker is open; the call was not attempted. retry_after is the shortest cooldown left."""
+
+class CircuitBreaker:
+    """
+    Opens when the failure rate over the last `window` calls reaches
+    `failure_rate`. After `cooldown` seconds one probe call is let through:
+    success closes the breaker, failure re-opens it.
+    """
+
+    def __init__(self, name: str, window: int = BREAKER_WINDOW, failure_rate: float = BREAKER_FAILURE_RATE,
+                 min_calls: int = BREAKER_MIN_CALLS, cooldown: float = BREAKER_COOLDOWN):
+        self.name = name
+        self.outcomes = deque(maxlen=window)
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.probing = False
+        self.opens = 0
+        self.rejected = 0
+        self.successes = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = "half_open"
+                self.probing = False
+            if self.state == "half_open" and not self.probing:
+                self.probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def retry_in(self) -> float:
+        """Seconds until the breaker lets a call through again (0 if it would now)."""
+        with self.lock:
+            if self.state == "open":
+                return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+            return 0.0
+
+    def skip(self):
+        """The allowed call was throttled: it counts neither way, but frees a half-open probe."""
+        with self.lock:
+            self.probing = False
+
+    def record(self, success: bool):
+        with self.lock:
+            if success:
+                self.successes += 1
+            else:
+                self.failures += 1
+            if self.state == "half_open":
+                self.probing = False
+                if success:
+                    self.state = "closed"
+                    self.outcomes.clear()
+                    logger.info(f"{self.name}: circuit closed after a successful probe.")
+                else:
+                    self._open()
+                return
+            self.outcomes.append(success)
+            failed = self.outcomes.count(False)
+            if self.state == "closed" and len(self.outcomes) >= self.min_calls \
+                    and failed / len(self.outcomes) >= self.failure_rate:
+                self._open()
+
+    def _open(self):
+        # Callers hold self.lock
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.opens += 1
+        logger.warning(f"{self.name}: circuit open for {self.cooldown:.0f}s "
+                       f"({self.outcomes.count(False)}/{len(self.outcomes)} recent calls failed).")
+
+    def metrics(self) -> dict:
+        with self.lock:
+            return {"state": self.state, "opens": self.opens, "rejected": self.rejected,
+                    "successes": self.successes, "failures": self.failures}
+
+class Hedger:
+    """
+    Runs a call and, if it hasn't finished after the observed latency quantile,
+    fires one duplicate and returns whichever succeeds first. Hedges are capped
+    at max_fraction of calls so duplicates can't multiply backend load.
+    """
+
+    def __init__(self, name: str, quantile: float = HEDGE_QUANTILE, max_fraction: float = HEDGE_MAX_FRACTION,
+                 min_delay: float = HEDGE_MIN_DELAY, min_samples: int = HEDGE_MIN_SAMPLES, max_workers: int = 32):
+        self.name = name
+        self.quantile = quantile
+        self.max_fraction = max_fraction
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.latencies = deque(maxlen=HEDGE_HISTORY)
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"hedge-{name}")
+
+    def delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None until enough latencies are known."""
+        with self.lock:
+            if len(self.latencies) < self.min_samples:
+                return None
+            ordered = sorted(self.latencies)
+        return max(self.min_delay, ordered[max(0, math.ceil(self.quantile * len(ordered)) - 1)])
+
+    def _timed(self, fn: Callable):
+        start = time.monotonic()
+        result = fn()
+        with self.lock:
+            self.latencies.append(time.monotonic() - start)
+        return result
+
+    def _take_hedge(self) -> bool:
+        with self.lock:
+            if self.hedged + 1 > self.max_fraction * self.calls:
+                return False
+            self.hedged += 1
+            return True
+
+    def call(self, fn: Callable):
+        with self.lock:
+            self.calls += 1
+        delay = self.delay() if self.max_fraction > 0 else None
+        if delay is None:
+            return self._timed(fn)
+
+        primary = self.pool.submit(self._timed, fn)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._take_hedge():
+            return primary.result()
+
+        backup = self.pool.submit(self._timed, fn)
+        pending, error = {primary, backup}, None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is backup:
+                        with self.lock:
+                            self.hedge_wins += 1
+                    # The slower request keeps running; its result is discarded
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def metrics(self) -> dict:
+        delay = self.delay()
+        with self.lock:
+            return {"calls": self.calls, "hedged": self.hedged, "hedge_wins": self.hedge_wins,
+                    "hedge_delay": round(delay, 3) if delay is not None else None}
+
+class Backend:
+    """A backend guarded by a circuit breaker, with hedged calls."""
+
+    def __init__(self, name: str, hedger: Optional[Hedger] = None, breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.hedger = hedger or Hedger(name)
+        self.breaker = breaker or CircuitBreaker(name)
+
+    def metrics(self) -> dict:
+        return {**self.breaker.metrics(), **self.hedger.metrics()}
+
+def failover(calls: List[Tuple[Backend, Callable]]):
+    """
+    Call the first (backend, fn) pair whose circuit lets it through; later
+    backends are only used while earlier circuits are open. Returns (backend
+    name, result). A failed call raises its error and a throttled one raises
+    QuotaExceeded, which doesn't count against the breaker. Raises CircuitOpen
+    if every circuit is open.
+    """
+    for backend, fn in calls:
+        if not backend.breaker.allow():
+            continue
+        try:
+            result = backend.hedger.call(fn)
+        except Exception as e:
+            if isinstance(e, QuotaExceeded) or is_quota_error(e):
+                backend.breaker.skip()
+                if isinstance(e, QuotaExceeded):
+                    raise
+                raise QuotaExceeded(f"{backend.name}: {e}") from e
+            backend.breaker.record(False)
+            logger.warning(f"{backend.name} failed: {e}")
+            raise
+        backend.breaker.record(True)
+        return backend.name, result
+    raise CircuitOpen(f"All circuits open: {', '.join(b.name for b, _ in calls)}",
+                      retry_after=min(b.breaker.retry_in() for b, _ in calls))
@@ -0,0 +1,165 @@
+"""
+Deadline-aware work scheduler for the news engine.
+Runs items in priority order on a thread pool and stops launching new work
+once the remaining wall-clock budget can't cover a typical item's p95 latency.
+Throttled items are retried after an exponential backoff. Items still running
+at the deadline get a short grace period; results that arrive later are
+discarded, and deferred items are left for the next run.
+"""
+import math
+import time
+import heapq
+import random
+import logging
+import threading
+import concurrent.futures
+from typing import Callable, List, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+class ScheduleResult(NamedTuple):
+    completed: list  # (item, result) in completion order
+    deferred: list   # items never launched, still running at the deadline or out of attempts
+    latencies: list  # per-item seconds observed in this run
+    requeued: int    # attempts pushed back to the queue by a requeue_on exception
+    exhausted: list = ()  # deferred items that used up max_attempts
+
+def p95(values: List[float]) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)]
+
+class DeadlineScheduler:
+    def __init__(self, budget_seconds: float, max_workers: int, latency_history: List[float] = (),
+                 default_latency: float = 60.0, min_samples: int = 3,
+                 retry_base: float = 2.0, retry_max: float = 60.0, grace_seconds: float = 20.0):
+        self.deadline = time.monotonic() + budget_seconds
+        self.max_workers = max_workers
+        self.history = list(latency_history)
+        self.latencies = []
+        self.default_latency = default_latency
+        self.min_samples = min_samples
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.grace_seconds = grace_seconds  # How long stragglers get to finish after the deadline
+        self.stopped = threading.Event()  # Set by stop() or once run() returns; nothing launches or requeues after
+
+    def expected_latency(self) -> float:
+        """p95 of this run's latencies plus recent history, or the default until there is enough data."""
+        samples = self.history + self.latencies
+        if len(samples) < self.min_samples:
+            return self.default_latency
+        return p95(samples)
+
+    def stop(self):
+        """Stop launching and requeueing items; running ones still get the grace period."""
+        self.stopped.set()
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def can_launch(self, at: float = None) -> bool:
+        """Whether an item started now (or at the monotonic time `at`) is expected to finish in budget."""
+        start = time.monotonic() if at is None else at
+        return self.deadline - start >= self.expected_latency()
+
+    def retry_delay(self, attempt: int, error: Exception) -> float:
+        """Exponential backoff with jitter, at least the error's retry_after if it has one."""
+        backoff = min(self.retry_max, self.retry_base * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+        return max(backoff, getattr(error, "retry_after", 0) or 0)
+
+    def _timed(self, work: Callable, item, index, requeue_on):
+        start = time.monotonic()
+        try:
+            result = work(item, index)
+        except requeue_on:
+            raise  # A throttled attempt says nothing about item latency
+        except Exception:
+            self.latencies.append(time.monotonic() - start)
+            raise
+        self.latencies.append(time.monotonic() - start)
+        return result
+
+    def run(self, items: list, work: Callable, requeue_on: tuple = (), max_attempts: int = 1) -> ScheduleResult:
+        """
+        Run work(item, index) for items (already in priority order) within the budget.
+        Items whose work raises one of requeue_on are retried after retry_delay(),
+        ahead of lower-priority items once due, up to max_attempts in total, and
+        are deferred after that.
+        """
+        ready = list(enumerate(items, 1))  # Heap by priority (index)
+        waiting = []  # Heap of (not before, index, item) for requeued items
+        attempts = {}
+        running = {}
+        completed = []
+        exhausted = []
+        throttled = []  # Throttled after the run stopped, with attempts left
+
+        def settle(future, retry: bool) -> bool:
+            """Record a finished item; True if it was requeued."""
+            index, item = running.pop(future)
+            try:
+                completed.append((item, future.result()))
+            except requeue_on as e:
+                if retry and attempts[index] < max_attempts and not self.stopped.is_set():
+                    delay = self.retry_delay(attempts[index], e)
+                    logger.warning(f"Requeueing item {index} in {delay:.1f}s after attempt {attempts[index]}: {e}")
+                    heapq.heappush(waiting, (time.monotonic() + delay, index, item))
+                    return True
+                logger.warning(f"Deferring item {index} after {attempts[index]} attempts: {e}")
+                (exhausted if attempts[index] >= max_attempts else throttled).append(item)
+            except Exception as e:
+                logger.error(f"Item failed: {e}")
+                completed.append((item, None))
+            return False
+
+        requeued = 0
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while (ready or waiting or running) and not self.stopped.is_set():
+                now = time.monotonic()
+                while waiting and waiting[0][0] <= now:
+                    _, index, item = heapq.heappop(waiting)
+                    heapq.heappush(ready, (index, item))
+                while ready and len(running) < self.max_workers and self.can_launch() and not self.stopped.is_set():
+                    index, item = heapq.heappop(ready)
+                    attempts[index] = attempts.get(index, 0) + 1
+                    future = executor.submit(self._timed, work, item, index, requeue_on)
+                    running[future] = (index, item)
+
+                if not running:
+                    if ready or not self.can_launch(waiting[0][0]):
+                        logger.warning(f"Budget exhausted: {self.remaining():.1f}s left, "
+                                       f"p95 item latency {self.expected_latency():.1f}s; "
+                                       f"deferring {len(ready) + len(waiting)} items.")
+                        break
+                    self.stopped.wait(max(0.0, waiting[0][0] - now))
+                    continue
+
+                timeout = max(0.0, self.remaining())
+                if waiting:
+                    timeout = min(timeout, max(0.0, waiting[0][0] - now))
+                done, _ = concurrent.futures.wait(
+                    running, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED,
+                )
+                if not done:
+                    if self.remaining() <= 0:
+                        logger.warning(f"Deadline reached with {len(running)} items still running.")
+                        break
+                    continue  # A requeued item is due
+                requeued += sum(settle(future, retry=True) for future in done)
+
+            # Stragglers get a short grace period; whatever finishes in it still counts
+            if running:
+                done, _ = concurrent.futures.wait(running, timeout=self.grace_seconds)
+                for future in done:
+                    settle(future, retry=False)
+                if running:
+                    logger.warning(f"{len(running)} items still running after the {self.grace_seconds:g}s grace "
+                                   "period; their results will be discarded.")
+        finally:
+            self.stopped.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        deferred = ([item for _, item in running.values()] + [item for _, item in sorted(ready)]
+                    + [item for _, _, item in sorted(waiting)] + throttled + exhausted)
+        return ScheduleResult(completed, deferred, list(self.latencies), requeued, exhausted)
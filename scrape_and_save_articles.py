@@ -11,6 +11,9 @@ from perplexity import Perplexity
 from num2words import num2words
 from dateutil import parser as date_parser
 
+import article_fetcher
+from profiling import profiled
+
 # Load environment variables from .env file
 # load_dotenv()
 
@@ -19,6 +22,7 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 GOOGLE_CLOUD_PROJECT = os.getenv("GOOGLE_CLOUD_PROJECT")
 PERPLEXITY_API_KEY = os.getenv("PERPLEXITY_API_KEY")
+FULL_TEXT_PROMPT_CHARS = int(os.getenv("FULL_TEXT_PROMPT_CHARS", "12000"))  # Source text passed to the summarizer
 
 # Initialize Supabase client
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
@@ -74,6 +78,7 @@ def parse_article_date(date_string):
         logging.warning(f"Could not parse date '{date_string}'. Defaulting to now.")
         return datetime.now().isoformat()
 
+@profiled
 def scrape_and_save_articles(request):
     """
     Cloud Function entry point that generates summaries and publishes a
@@ -97,6 +102,7 @@ def scrape_and_save_articles(request):
 
         logging.info(f"Category '{category}' summary generated with {len(category_completion.search_results)} sources.")
 
+        new_articles = []
         for article_info in category_completion.search_results:
             url = article_info.url
             if not url or url in processed_urls:
@@ -107,10 +113,22 @@ def scrape_and_save_articles(request):
                 logging.info(f"Article from this URL already exists: {url}")
                 processed_urls.add(url)
                 continue
+            new_articles.append(article_info)
+
+        # Pull the sources' full text in one concurrent pass so summaries are based on the articles themselves
+        full_texts = article_fetcher.fetch_many(a.url for a in new_articles)
+
+        for article_info in new_articles:
+            url = article_info.url
+            if url in processed_urls:
+                continue
 
             logging.info(f"Generating detailed summary for article: {url}")
             
             article_prompt = f"Summarize the article from this URL in Hungarian, using about 70-100 words: {url}. Please provide a suitable title for the summary based on the article's content."
+            full_text = full_texts.get(url)
+            if full_text:
+                article_prompt += f"\n\nArticle text:\n{full_text[:FULL_TEXT_PROMPT_CHARS]}"
             article_completion = get_perplexity_completion(article_prompt)
 
             if not article_completion or not article_completion.choices:
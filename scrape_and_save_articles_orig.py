@@ -2,8 +2,6 @@ import feedparser
 import logging
 import os
 import re
-import requests
-from bs4 import BeautifulSoup
 from datetime import datetime
 from dateutil import parser as date_parser
 from datetime import datetime
@@ -14,6 +12,9 @@ import google.generativeai as genai
 import json
 from openai import OpenAI
 
+import article_fetcher
+import translation
+
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
@@ -55,6 +56,15 @@ model = genai.GenerativeModel(model_name="gemini-2.0-flash",
                               generation_config=generation_config,
                               safety_settings=safety_settings)
 
+# Batched paragraph translation returns a JSON array of strings
+translation_config = genai.GenerationConfig(
+    temperature=0.2,
+    top_p=1,
+    top_k=30,
+    max_output_tokens=2048,
+    response_mime_type="application/json",
+)
+
 # List of RSS Feeds
 RSS_FEEDS = [
     "https://konteo.blogrepublik.eu/feed/"
@@ -87,40 +97,30 @@ def parse_pub_date(entry) -> datetime:
     return datetime.now()
 
 def scrape_full_article(article_url):
-    """Scrapes the full article text from a given URL, looking for 'posztkenyerszoveg' class."""
-    try:
-        response = requests.get(article_url, timeout=10) # Added timeout
-        response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
-        soup = BeautifulSoup(response.content, 'html.parser')
-        article_div = soup.find('div', class_='posztkenyerszoveg')
-        if article_div:
-            article_text = article_div.get_text(separator='\n', strip=True) # Using separator and strip for cleaner text
-            return article_text
-        else:
-            logging.warning(f"Div with class 'posztkenyerszoveg' not found on: {article_url}")
-            return None
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error scraping URL {article_url}: {e}")
-        return None
+    """Scrapes the full article text from a given URL using the site's selector (div.posztkenyerszoveg)."""
+    return article_fetcher.fetch_article_text(article_url)
+
+def generate_translation(prompt):
+    """Send one translation batch prompt to Gemini and return the reply text."""
+    response = model.generate_content([prompt], generation_config=translation_config)
+    if response.text:
+        return response.text
+    elif response.candidates and response.candidates[0].content.parts: # Handling cases with candidates
+        return "".join([part.text for part in response.candidates[0].content.parts if hasattr(part, 'text')])
+    raise ValueError("empty Gemini response")
 
 def translate_text_with_gemini(text, target_language='english'):
-    """Translates text to English using Gemini Pro."""
+    """
+    Translates text to English using Gemini, paragraph by paragraph: cached
+    paragraphs are reused and the rest go out in concurrent, token-budgeted batches.
+    """
     if not text:
         return None  # Or empty string, depending on how you want to handle empty input
 
-    try:
-        prompt = f"Translate the following text to {target_language}: {text}" # More explicit prompt
-        response = model.generate_content([prompt])
-        if response.text:
-            return response.text
-        elif response.candidates and response.candidates[0].content.parts: # Handling cases with candidates
-            return "".join([part.text for part in response.candidates[0].content.parts if hasattr(part, 'text')])
-        else:
-            logging.warning(f"Gemini Pro translation failed, empty response for text: {text[:100]}...") # Log first 100 chars
-            return None
-    except Exception as e: # Catch broader exceptions for Gemini errors
-        logging.error(f"Gemini Pro translation error: {e}")
-        return None
+    translated = translation.translate(text, target_language, generate_translation)
+    if not translated:
+        logging.warning(f"Gemini translation failed for text: {text[:100]}...") # Log first 100 chars
+    return translated
 
 def scrape_and_save_articles(request):
     publisher = pubsub_v1.PublisherClient()
@@ -130,15 +130,20 @@ def scrape_and_save_articles(request):
         logging.info(f"Scraping RSS feed: {url}")
         feed = feedparser.parse(url)
 
+        new_entries = []
         for entry in feed.entries[:1]: # Limiting to first article for testing, remove [:1] for all
             # Check if article exists
             response = supabase.table("article").select("*").eq("link", entry.link).execute()
             if response.data:
                 logging.info(f"Article already exists in database: {entry.title}")
                 continue
+            new_entries.append(entry)
+
+        # Scrape full article texts concurrently over pooled connections
+        full_texts = article_fetcher.fetch_many(entry.link for entry in new_entries)
 
-            # Scrape full article text
-            full_article_text = scrape_full_article(entry.link)
+        for entry in new_entries:
+            full_article_text = full_texts.get(entry.link)
 
             # Translate full article text
             translated_text = None
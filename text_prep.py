@@ -0,0 +1,160 @@
+"""
+Text preparation shared by every TTS path.
+Joins wrapped lines into paragraphs, strips markdown, drops repeated title
+prefixes and sentences, and trims the text to a character/duration budget
+at sentence boundaries.
+"""
+import os
+import re
+import logging
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+# Budgets; 0 disables the limit
+TTS_MAX_CHARS = int(os.getenv("TTS_MAX_CHARS", "0"))
+TTS_MAX_SECONDS = float(os.getenv("TTS_MAX_SECONDS", "0"))
+# Rough speaking rate used to turn a duration budget into characters
+TTS_CHARS_PER_SECOND = float(os.getenv("TTS_CHARS_PER_SECOND", "15"))
+
+CODE_FENCE = re.compile(r"```.*?```", re.S)
+IMAGE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+LINK = re.compile(r"\[([^\]]+)\]\([^)]*\)")
+CITATION = re.compile(r"\s*\[\d+(?:[,\s]*\d+)*\]")
+HEADING = re.compile(r"^\s{0,3}#{1,6}\s*", re.M)
+BLOCKQUOTE = re.compile(r"^\s*>\s?", re.M)
+# "1." is only a list marker in a run of numbered lines; alone it is usually a date or ordinal ("2024. október")
+LIST_MARKER = re.compile(r"^\s*(?:[-*+•]|\d+\))\s+", re.M)
+NUMBERED_ITEM = re.compile(r"^\s*\d+\.\s+")
+# Lines that start a block of their own; other lines continue the paragraph they wrap from
+BLOCK_START = re.compile(r"^\s{0,3}#{1,6}\s|^\s*(?:[-*+•]|\d+\))\s+")
+RULE = re.compile(r"^\s*(?:[-*_]\s*){3,}$", re.M)
+TABLE_PIPE = re.compile(r"\s*\|\s*")
+EMPHASIS = re.compile(r"(\*{1,3}|_{2,3})(\S(?:.*?\S)?)\1")
+INLINE_CODE = re.compile(r"`([^`]*)`")
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+TERMINAL_PUNCTUATION = (".", "!", "?", "…", ":", ";")
+
+class PreparedText(NamedTuple):
+    text: str
+    original_chars: int
+
+    @property
+    def saved_chars(self) -> int:
+        return self.original_chars - len(self.text)
+
+def strip_markdown(text: str) -> str:
+    """Remove markdown syntax, keeping the readable words."""
+    text = CODE_FENCE.sub(" ", text)
+    text = IMAGE.sub("", text)
+    text = LINK.sub(r"\1", text)
+    text = CITATION.sub("", text)
+    text = RULE.sub("", text)
+    text = HEADING.sub("", text)
+    text = BLOCKQUOTE.sub("", text)
+    text = LIST_MARKER.sub("", text)
+    text = EMPHASIS.sub(r"\2", text)
+    text = INLINE_CODE.sub(r"\1", text)
+    text = TABLE_PIPE.sub(" ", text) if "|" in text else text
+    return text
+
+def _sentence_key(sentence: str) -> str:
+    return "".join(ch for ch in sentence.casefold() if ch.isalnum())
+
+def split_blocks(text: str) -> list:
+    """
+    Group lines into blocks: wrapped lines join into one paragraph, while blank
+    lines, rules, markdown headings and list items end a block.
+    """
+    lines = CODE_FENCE.sub(" ", text).splitlines()
+    content = [i for i, line in enumerate(lines) if line.strip()]
+    numbered = {i for i in content if NUMBERED_ITEM.match(lines[i])}
+    # Numbered items count as a list only next to another numbered line
+    list_items = {i for n, i in enumerate(content) if i in numbered and (
+        (n > 0 and content[n - 1] in numbered) or (n + 1 < len(content) and content[n + 1] in numbered))}
+
+    blocks, current = [], []
+    for i, line in enumerate(lines):
+        if not line.strip() or RULE.match(line):
+            blocks.append(current)
+            current = []
+        elif i in list_items or BLOCK_START.match(line):
+            blocks.append(current)
+            current = [NUMBERED_ITEM.sub("", line) if i in list_items else line]
+            if HEADING.match(line):
+                blocks.append(current)
+                current = []
+        else:
+            current.append(line)
+    blocks.append(current)
+    return ["\n".join(block) for block in blocks if block]
+
+def split_sentences(text: str) -> list:
+    """Split markdown or plain text into sentences; blocks without end punctuation (headings, bullets) get a period."""
+    sentences = []
+    for block in split_blocks(text):
+        block = " ".join(strip_markdown(block).split())
+        if not block:
+            continue
+        if not block.endswith(TERMINAL_PUNCTUATION):
+            block += "."
+        block_sentences = []
+        for piece in SENTENCE_END.split(block):
+            # A lowercase continuation follows a date, ordinal or abbreviation ("2024. október", "stb. és")
+            if block_sentences and piece[:1].islower() and not block_sentences[-1].endswith(("!", "?")):
+                block_sentences[-1] += f" {piece}"
+            elif piece:
+                block_sentences.append(piece)
+        sentences.extend(block_sentences)
+    return sentences
+
+def _char_budget(max_chars: Optional[int], max_seconds: Optional[float]) -> int:
+    max_chars = TTS_MAX_CHARS if max_chars is None else max_chars
+    max_seconds = TTS_MAX_SECONDS if max_seconds is None else max_seconds
+    budgets = [b for b in (max_chars, int(max_seconds * TTS_CHARS_PER_SECOND)) if b > 0]
+    return min(budgets) if budgets else 0
+
+def _apply_budget(sentences: list, budget: int) -> list:
+    if not budget:
+        return sentences
+    kept, used = [], 0
+    for sentence in sentences:
+        cost = len(sentence) + (1 if kept else 0)
+        if used + cost > budget:
+            break
+        kept.append(sentence)
+        used += cost
+    if not kept and sentences:
+        # A single sentence longer than the budget: cut at a word boundary, leaving room for the "."
+        cut = sentences[0][:budget - 1].rsplit(" ", 1)[0]
+        kept.append(cut.rstrip(",;:") + ".")
+    return kept
+
+@lru_cache(maxsize=512)
+def prepare_tts_text(text: str, title: Optional[str] = None,
+                     max_chars: Optional[int] = None, max_seconds: Optional[float] = None) -> PreparedText:
+    """
+    Normalize text for synthesis. When a title is given it is read first and
+    only once, even if the body repeats it. Results are memoized so every TTS path can reuse them.
+    """
+    original = f"{title}. {text}" if title else text
+    sentences = split_sentences(text or "")
+
+    if title:
+        title = " ".join(strip_markdown(title).split())
+        if not title.endswith(TERMINAL_PUNCTUATION):
+            title += "."
+        # A body that repeats the title (e.g. as a heading) loses it in the dedup below
+        sentences = [title] + sentences
+
+    unique, seen = [], set()
+    for sentence in sentences:
+        key = _sentence_key(sentence)
+        if key and key not in seen:
+            unique.append(sentence)
+            seen.add(key)
+
+    kept = _apply_budget(unique, _char_budget(max_chars, max_seconds))
+    prepared = PreparedText(" ".join(kept), len(original))
+    logging.info(f"TTS text prepared: {len(prepared.text)} of {prepared.original_chars} chars "
+                 f"({prepared.saved_chars} saved)")
+    return prepared
@@ -0,0 +1,269 @@
+"""
+Paragraph-level translation engine: splits text at paragraph boundaries,
+packs paragraphs into batches that fit the model's token budget, translates
+the batches concurrently and caches every paragraph's translation by content
+hash, so re-scraped articles only pay for the paragraphs that changed.
+Wrapped lines within a paragraph are joined; a paragraph over the batch
+budget is split into sentence groups, and a sentence over it at word
+boundaries. Use a gs:// TRANSLATION_CACHE to keep entries across cold starts.
+"""
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Local directory or gs://bucket/prefix
+TRANSLATION_CACHE = os.getenv("TRANSLATION_CACHE", "/tmp/translation_cache")
+TRANSLATION_WORKERS = int(os.getenv("TRANSLATION_WORKERS", "4"))
+# Input tokens per batch; translations come out longer, so this leaves room under max_output_tokens
+TRANSLATION_BATCH_TOKENS = int(os.getenv("TRANSLATION_BATCH_TOKENS", "700"))
+CHARS_PER_TOKEN = 3  # Conservative for Hungarian
+MEMORY_CACHE_SIZE = 5000
+
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+PARAGRAPH_BREAK = re.compile(r"(\s*\n\s*\n\s*)")  # Blank lines between paragraphs
+HEADING = re.compile(r"^\s{0,3}#{1,6}\s")
+LIST_ITEM = re.compile(r"^\s*(?:[-*+•]|\d+\))\s")
+CODE_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+class TranslationCache:
+    """Translations keyed by content hash, in memory and in a local directory or under a gs:// prefix."""
+
+    def __init__(self, location: str = TRANSLATION_CACHE):
+        self.location = location
+        self.memory: Dict[str, str] = {}
+        self.lock = threading.Lock()
+        self.bucket = None
+        self.prefix = ""
+        if location.startswith("gs://"):
+            from google.cloud import storage
+            bucket_name, _, prefix = location[len("gs://"):].partition("/")
+            self.bucket = storage.Client().bucket(bucket_name)
+            self.prefix = prefix.rstrip("/")
+
+    @staticmethod
+    def key(text: str, target_language: str) -> str:
+        return hashlib.sha256(f"{target_language.lower()}\0{text}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        if self.bucket is not None:
+            return f"{self.prefix}/{key}.txt" if self.prefix else f"{key}.txt"
+        return os.path.join(self.location, f"{key}.txt")
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            if key in self.memory:
+                return self.memory[key]
+        try:
+            if self.bucket is not None:
+                blob = self.bucket.get_blob(self._path(key))
+                value = blob.download_as_bytes().decode("utf-8") if blob is not None else None
+            else:
+                with open(self._path(key), encoding="utf-8") as f:
+                    value = f.read()
+        except FileNotFoundError:
+            value = None
+        except Exception as e:
+            logger.warning(f"Translation cache read failed: {e}")
+            value = None
+        if value is not None:
+            self._remember(key, value)
+        return value
+
+    def put(self, key: str, value: str):
+        self._remember(key, value)
+        try:
+            if self.bucket is not None:
+                self.bucket.blob(self._path(key)).upload_from_string(value, content_type="text/plain; charset=utf-8")
+            else:
+                os.makedirs(self.location, exist_ok=True)
+                temp = f"{self._path(key)}.{threading.get_ident()}.tmp"
+                with open(temp, "w", encoding="utf-8") as f:
+                    f.write(value)
+                os.replace(temp, self._path(key))
+        except Exception as e:
+            logger.warning(f"Translation cache write failed: {e}")
+
+    def _remember(self, key: str, value: str):
+        with self.lock:
+            if len(self.memory) >= MEMORY_CACHE_SIZE:
+                self.memory.clear()
+            self.memory[key] = value
+
+@lru_cache(maxsize=None)
+def get_cache() -> TranslationCache:
+    return TranslationCache()
+
+def reflow(paragraph: str) -> str:
+    """Join wrapped lines with a space, keeping the line breaks around headings and list items."""
+    lines = []
+    for line in paragraph.split("\n"):
+        if lines and not (HEADING.match(line) or LIST_ITEM.match(line) or HEADING.match(lines[-1])):
+            lines[-1] = f"{lines[-1].rstrip()} {line.strip()}"
+        else:
+            lines.append(line)
+    return "\n".join(lines)
+
+def split_paragraphs(text: str) -> List[str]:
+    """
+    Split into paragraph and blank-line separator runs, with each paragraph
+    reflowed; joining the list gives back the text up to the reflowed lines.
+    """
+    return [part if PARAGRAPH_BREAK.fullmatch(part) else reflow(part)
+            for part in PARAGRAPH_BREAK.split(text) if part]
+
+def split_words(sentence: str, max_tokens: int) -> List[str]:
+    """Break an over-budget sentence at word boundaries (inside a word only if that alone is too long)."""
+    max_chars = max(1, max_tokens - 1) * CHARS_PER_TOKEN
+    pieces, current = [], ""
+    for word in sentence.split():
+        for start in range(0, len(word), max_chars):
+            chunk = word[start:start + max_chars]
+            if current and estimate_tokens(f"{current} {chunk}") > max_tokens:
+                pieces.append(current)
+                current = chunk
+            else:
+                current = f"{current} {chunk}" if current else chunk
+    if current:
+        pieces.append(current)
+    return pieces
+
+def split_long(paragraph: str, max_tokens: int) -> List[str]:
+    """Break an over-budget paragraph into sentence groups that fit max_tokens."""
+    pieces, current = [], ""
+    for sentence in SENTENCE_END.split(paragraph):
+        parts = split_words(sentence, max_tokens) if estimate_tokens(sentence) > max_tokens else [sentence]
+        for part in parts:
+            if current and estimate_tokens(current) + estimate_tokens(part) > max_tokens:
+                pieces.append(current)
+                current = part
+            else:
+                current = f"{current} {part}" if current else part
+    if current:
+        pieces.append(current)
+    return pieces
+
+def pack_batches(segments: List[str], max_tokens: int) -> List[List[str]]:
+    """Group consecutive segments into batches of at most max_tokens input tokens."""
+    batches, current, size = [], [], 0
+    for segment in segments:
+        tokens = estimate_tokens(segment)
+        if current and size + tokens > max_tokens:
+            batches.append(current)
+            current, size = [], 0
+        current.append(segment)
+        size += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def build_prompt(segments: List[str], target_language: str) -> str:
+    return (
+        f"Translate each of the following text segments to {target_language}. "
+        "They are consecutive parts of one article. "
+        f"Return only a JSON array of exactly {len(segments)} strings: the translations, in the same order. "
+        "Do not merge, split, summarize or omit segments.\n"
+        f"{json.dumps(segments, ensure_ascii=False)}"
+    )
+
+def single_translation(reply: str, parsed, is_json: bool) -> Optional[str]:
+    """
+    A lone segment sometimes comes back as a JSON string, an object with one
+    string field, or plain text instead of a one-element array. Anything else
+    is rejected so it never reaches the cache.
+    """
+    if is_json:
+        if isinstance(parsed, (int, float)) and not isinstance(parsed, bool):
+            return reply  # A number needs no translation
+        if isinstance(parsed, dict) and len(parsed) == 1:
+            parsed = next(iter(parsed.values()))
+        return parsed.strip() if isinstance(parsed, str) and parsed.strip() else None
+    # Truncated or malformed JSON isn't a translation either
+    return reply if reply and not reply.startswith(("[", "{", '"')) else None
+
+def translate_batch(segments: List[str], target_language: str,
+                    generate: Callable[[str], str]) -> Dict[str, str]:
+    """
+    Translate a batch in one call. If the reply doesn't line up with the
+    segments, the batch is halved and retried, down to single segments.
+    Returns the segments that were translated.
+    """
+    try:
+        reply = CODE_FENCE.sub("", generate(build_prompt(segments, target_language)).strip())
+    except Exception as e:
+        logger.error(f"Translation batch of {len(segments)} segments failed: {e}")
+        return {}
+    try:
+        translations, is_json = json.loads(reply), True
+    except ValueError:
+        translations, is_json = None, False
+    if isinstance(translations, list) and len(translations) == len(segments) \
+            and all(isinstance(t, str) and t.strip() for t in translations):
+        return dict(zip(segments, (t.strip() for t in translations)))
+    if len(segments) == 1:
+        translation = single_translation(reply, translations, is_json)
+        return {segments[0]: translation} if translation else {}
+
+    logger.warning(f"Translation reply didn't match {len(segments)} segments; splitting the batch.")
+    middle = len(segments) // 2
+    return {**translate_batch(segments[:middle], target_language, generate),
+            **translate_batch(segments[middle:], target_language, generate)}
+
+def translate(text: str, target_language: str, generate: Callable[[str], str],
+              cache: Optional[TranslationCache] = None,
+              max_tokens: int = TRANSLATION_BATCH_TOKENS) -> Optional[str]:
+    """
+    Translate text paragraph by paragraph. generate(prompt) returns the model's
+    reply text. Cached paragraphs are reused; the rest are packed into batches
+    and translated concurrently. Returns None if any paragraph failed, after
+    caching the ones that succeeded.
+    """
+    if not text:
+        return None
+    cache = cache or get_cache()
+
+    # Paragraphs keep their original separators; over-budget ones are translated in sentence groups
+    parts = split_paragraphs(text)
+    layout = []
+    for part in parts:
+        if not part.strip():
+            layout.append(part)
+        elif estimate_tokens(part) > max_tokens:
+            layout.append(split_long(part, max_tokens))
+        else:
+            layout.append([part])
+    segments = list(dict.fromkeys(s for entry in layout if isinstance(entry, list) for s in entry))
+
+    translated, missing = {}, []
+    for segment in segments:
+        cached = cache.get(TranslationCache.key(segment, target_language))
+        if cached is not None:
+            translated[segment] = cached
+        else:
+            missing.append(segment)
+
+    batches = pack_batches(missing, max_tokens)
+    if batches:
+        with ThreadPoolExecutor(max_workers=min(TRANSLATION_WORKERS, len(batches))) as pool:
+            for result in pool.map(lambda batch: translate_batch(batch, target_language, generate), batches):
+                for segment, translation in result.items():
+                    cache.put(TranslationCache.key(segment, target_language), translation)
+                translated.update(result)
+    logger.info(f"Translated {len(segments)} segments: {len(segments) - len(missing)} cached, "
+                f"{len(missing)} in {len(batches)} batches.")
+
+    failed = [s for s in segments if s not in translated]
+    if failed:
+        logger.error(f"Translation failed for {len(failed)} of {len(segments)} segments.")
+        return None
+    return "".join(entry if isinstance(entry, str) else " ".join(translated[s] for s in entry) for entry in layout)